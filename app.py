@@ -34,6 +34,50 @@ def health():
         "bot_running": bot_running
     })
 
+@app.route('/schedule')
+def schedule():
+    """الفترة الحالية وموعد الجلب التالي لكل مصدر"""
+    from source_scheduler import source_scheduler
+    return jsonify({
+        "sources": source_scheduler.get_status(),
+        "timestamp": time.time()
+    })
+
+@app.route('/outbox')
+def outbox():
+    """عمق صندوق الإرسال وعمر أقدم عنصر فيه"""
+    from database import get_outbox_stats
+    from publisher import outbox_publisher
+    return jsonify({
+        **get_outbox_stats(),
+        "publisher_running": outbox_publisher.running,
+        "published": outbox_publisher.published,
+        "failed": outbox_publisher.failed,
+        "timestamp": time.time()
+    })
+
+@app.route('/cycles')
+def cycles():
+    """مدة دورات الجلب وعدد التشغيلات المتجاهلة أو المدمجة"""
+    from cycle_guard import fetch_guard
+    return jsonify({
+        **fetch_guard.get_stats(),
+        "timestamp": time.time()
+    })
+
+@app.route('/cache')
+def cache():
+    """حالة التخزين المؤقت للصور وإعادة استخدام file_id والروابط الفاشلة"""
+    from cache_manager import cache_manager
+    from telegram_file_cache import telegram_file_cache
+    from negative_cache import negative_cache
+    return jsonify({
+        **cache_manager.get_cache_stats(),
+        "telegram_files": telegram_file_cache.get_stats(),
+        "negative_cache": negative_cache.get_stats(),
+        "timestamp": time.time()
+    })
+
 @app.route('/start-bot')
 def start_bot():
     """تشغيل البوت"""
@@ -0,0 +1,46 @@
+# article_records.py
+# دوال تحويل بيانات المقال الخام إلى سجلات جاهزة للحفظ.
+# تُنفذ في مجموعة العمليات (cpu_pool) لذلك تستقبل وترجع قيماً بسيطة فقط (قواميس ونصوص وتواريخ)
+
+from classifier import classify_article
+from nlp_analyzer import news_analyzer
+
+def build_article_record(article_data, page, source):
+    """بناء سجل مقال من بيانات الخلاصة وصفحة المقال: المحتوى والتصنيف والمشاعر والوسائط"""
+    page = page or {}
+
+    full_content = page.get('content')
+    summary = full_content if full_content else article_data['summary']
+    image_url = article_data.get('image_url') or page.get('image_url', '')
+
+    # تاريخ الصفحة أدق من وقت الجلب عندما لا توفر الخلاصة تاريخاً
+    published_date = article_data['published_date']
+    published_date_estimated = bool(article_data.get('published_date_estimated'))
+    if published_date_estimated and page.get('published_date'):
+        published_date = page['published_date']
+        published_date_estimated = False
+
+    # تصنيف المقال
+    category = classify_article(article_data['title'], summary)
+
+    # إذا كان المصدر له فئة محددة، استخدمها
+    if 'category' in source:
+        category = source['category']
+
+    return {
+        'title': article_data['title'],
+        'link': article_data['link'],
+        'source': article_data['source_name'],
+        'published_date': published_date,
+        'published_date_estimated': published_date_estimated,
+        'category': category,
+        'image_url': image_url,
+        'video_url': page.get('video_url'),
+        'summary': summary,
+        # تحليل المشاعر
+        'sentiment_score': news_analyzer.analyze_sentiment(article_data['title'] + " " + summary),
+    }
+
+def build_article_records(items, source):
+    """بناء سجلات جميع المقالات الجديدة لمصدر واحد في استدعاء واحد (تقليل النقل بين العمليات)"""
+    return [build_article_record(article_data, page, source) for article_data, page in items]
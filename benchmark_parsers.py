@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+سكريبت قياس سرعة تحليل صفحات المقالات لكل مصدر: html.parser مقابل lxml
+
+الاستخدام:
+    python benchmark_parsers.py --save benchmark_pages   # حفظ صفحة مقال حديثة من كل مصدر RSS
+    python benchmark_parsers.py benchmark_pages          # قياس السرعة على الصفحات المحفوظة
+"""
+
+import sys
+import json
+import time
+import hashlib
+from pathlib import Path
+import requests
+import feedparser
+from sources import NEWS_SOURCES, get_source_by_name
+from config import HTTP_USER_AGENT
+from web_scraper import _parse_article_page
+
+INDEX_FILE = 'index.json'
+ITERATIONS = 20
+
+def save_pages(pages_dir):
+    """تحميل أحدث مقال من كل مصدر RSS وحفظه مع فهرس (الملف -> المصدر والرابط)"""
+    pages_dir.mkdir(parents=True, exist_ok=True)
+    headers = {'User-Agent': HTTP_USER_AGENT}
+    index = {}
+
+    for source in NEWS_SOURCES:
+        if source['type'] != 'rss':
+            continue
+        try:
+            feed = feedparser.parse(requests.get(source['url'], headers=headers, timeout=15).content)
+            if not feed.entries:
+                print(f"⚠️ {source['name']}: لا توجد مقالات")
+                continue
+            link = feed.entries[0].link
+            response = requests.get(link, headers=headers, timeout=15)
+            response.raise_for_status()
+            filename = hashlib.md5(link.encode()).hexdigest() + '.html'
+            (pages_dir / filename).write_bytes(response.content)
+            index[filename] = {'source': source['name'], 'url': link}
+            print(f"✅ {source['name']}: {link}")
+        except Exception as e:
+            print(f"❌ {source['name']}: خطأ - {e}")
+
+    (pages_dir / INDEX_FILE).write_text(json.dumps(index, ensure_ascii=False, indent=2), encoding='utf-8')
+    print(f"\n💾 تم حفظ {len(index)} صفحة في {pages_dir}")
+
+def _time_parser(content, source, url, backend):
+    started = time.perf_counter()
+    for _ in range(ITERATIONS):
+        _parse_article_page(content, source, url, backend)
+    return (time.perf_counter() - started) / ITERATIONS * 1000
+
+def run_benchmark(pages_dir):
+    """قياس متوسط زمن تحليل كل صفحة بالمحللين وطباعة نسبة التسريع لكل مصدر"""
+    try:
+        import lxml  # noqa: F401
+    except ImportError:
+        print("❌ lxml غير مثبت: pip install lxml")
+        return 1
+
+    index = json.loads((pages_dir / INDEX_FILE).read_text(encoding='utf-8'))
+    print(f"{'المصدر':<40} {'html.parser':>12} {'lxml':>10} {'التسريع':>8}")
+    print("=" * 74)
+
+    total_builtin = total_lxml = 0.0
+    for filename, entry in index.items():
+        content = (pages_dir / filename).read_bytes()
+        source = get_source_by_name(entry['source'])
+        builtin_ms = _time_parser(content, source, entry['url'], 'html.parser')
+        lxml_ms = _time_parser(content, source, entry['url'], 'lxml')
+        total_builtin += builtin_ms
+        total_lxml += lxml_ms
+        print(f"{entry['source']:<40} {builtin_ms:>10.1f}ms {lxml_ms:>8.1f}ms {builtin_ms / lxml_ms:>7.2f}x")
+
+    if index:
+        print("=" * 74)
+        print(f"{'الإجمالي':<40} {total_builtin:>10.1f}ms {total_lxml:>8.1f}ms {total_builtin / total_lxml:>7.2f}x")
+    return 0
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == '--save':
+        save_pages(Path(sys.argv[2]))
+    elif len(sys.argv) == 2:
+        sys.exit(run_benchmark(Path(sys.argv[1])))
+    else:
+        print(__doc__)
+        sys.exit(2)
@@ -3,17 +3,31 @@
 import asyncio
 import logging
 import datetime
+import functools
+from collections import Counter
 import time
 from telegram import Bot, InputMediaPhoto, InputMediaVideo, Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import Application, CommandHandler, ContextTypes, CallbackContext, filters, MessageHandler, CallbackQueryHandler
 from telegram.constants import ParseMode
+from telegram.error import BadRequest, ChatMigrated, RetryAfter
 from config import TELEGRAM_BOT_TOKEN, TELEGRAM_CHANNEL_ID
 from utils import clean_html, format_date, enhance_title, create_hashtags, prepare_article_content
-from media_handler import extract_video_url, is_youtube_url, get_video_thumbnail
+from media_handler import is_youtube_url, get_video_thumbnail
 from stats import bot_stats
 from notifications import notification_manager
 from nlp_analyzer import news_analyzer
 from cache_manager import cache_manager
+from http_client import http_client
+from source_scheduler import source_scheduler
+from seen_links import seen_links
+from db_writer import db_writer
+from cpu_pool import cpu_pool
+from publisher import outbox_publisher
+from cycle_guard import fetch_guard
+from priority_queue import article_queue, article_rank, RANK_URGENT, RANK_LOCAL, RANK_OFFICIAL, RANK_ECONOMIC, RANK_SPORTS, RANK_OTHER
+from rate_limiter import telegram_rate_limiter
+from channel_cache import channel_id_cache
+from telegram_file_cache import telegram_file_cache
 from error_handler import handle_telegram_error, retry_on_failure, log_error, error_stats, setup_error_logging
 
 # Enable logging
@@ -23,30 +37,53 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 async def get_channel_id(bot, channel_username):
-    """تحويل معرف القناة من @username إلى معرف رقمي"""
+    """تحويل معرف القناة من @username إلى معرف رقمي (مرة واحدة ثم من الذاكرة أو قاعدة البيانات)"""
     try:
-        # إذا كان المعرف يبدأ بـ @، نحاول تحويله
-        if channel_username.startswith('@'):
-            try:
-                chat = await bot.get_chat(channel_username)
-                logger.info(f"تم تحويل معرف القناة {channel_username} إلى {chat.id}")
-                return str(chat.id)
-            except Exception as chat_error:
-                logger.warning(f"فشل في تحويل معرف القناة {channel_username}: {chat_error}")
-                # إذا فشل التحويل، نستخدم المعرف كما هو
-                return channel_username
-        # إذا كان المعرف رقمي أو لا يبدأ بـ @، نستخدمه كما هو
-        return channel_username
+        return await channel_id_cache.resolve(bot, channel_username)
     except Exception as e:
         logger.error(f"خطأ في تحويل معرف القناة {channel_username}: {e}")
         # في حالة أي خطأ، نستخدم المعرف الأصلي
         return channel_username
 
+async def send_to_channel(bot, method, **kwargs):
+    """إرسال إلى القناة عبر محدد المعدل، مع تحديث المعرف وإعادة الإرسال إذا نُقلت المحادثة"""
+    channel_id = await get_channel_id(bot, TELEGRAM_CHANNEL_ID)
+    try:
+        return await telegram_rate_limiter.send(channel_id, method, **kwargs)
+    except ChatMigrated as e:
+        await channel_id_cache.migrate(TELEGRAM_CHANNEL_ID, e.new_chat_id)
+        return await telegram_rate_limiter.send(str(e.new_chat_id), method, **kwargs)
+
+async def send_photo_to_channel(bot, photo, **kwargs):
+    """
+    إرسال صورة إلى القناة. الصورة المحفوظة محلياً تُرفع مرة واحدة فقط:
+    بعد أول رفع يُحفظ file_id ببصمة المحتوى ويُرسل بدلاً من الملف في المرات التالية
+    """
+    content_hash = await telegram_file_cache.content_hash(photo)
+    if content_hash:
+        file_id = await telegram_file_cache.get(content_hash)
+        if file_id:
+            try:
+                return await send_to_channel(bot, bot.send_photo, photo=file_id, **kwargs)
+            except BadRequest as e:
+                if 'file' not in str(e).lower():
+                    raise
+                # التليجرام لم يعد يقبل المعرف: نرفع الملف من جديد
+                logger.warning(f"file_id مرفوض للصورة {photo}: {e}")
+                await telegram_file_cache.forget(content_hash)
+
+    message = await send_to_channel(bot, bot.send_photo, photo=photo, **kwargs)
+    if content_hash and message and message.photo:
+        # أكبر مقاس هو الأخير في القائمة
+        largest = message.photo[-1]
+        await telegram_file_cache.store(content_hash, largest.file_id, largest.file_unique_id)
+    return message
+
 # تم حذف أوامر التشغيل - البوت يعمل تلقائياً الآن
 
 async def stats_command(update, context):
     """عرض إحصائيات البوت."""
-    stats = bot_stats.get_summary()
+    stats = await asyncio.to_thread(bot_stats.get_summary)
     
     # إنشاء لوحة مفاتيح للتنقل بين الإحصائيات
     keyboard = [
@@ -61,7 +98,8 @@ async def stats_command(update, context):
     text += f"📰 *إجمالي الأخبار المنشورة:* {stats['total_articles']}\n"
     text += f"📆 *عدد أيام التشغيل:* {stats['days_running']}\n"
     text += f"📈 *متوسط الأخبار اليومي:* {stats['avg_per_day']}\n"
-    text += f"👥 *عدد المشتركين:* {notification_manager.get_subscribers_count()}\n\n"
+    subscribers_count = await asyncio.to_thread(notification_manager.get_subscribers_count)
+    text += f"👥 *عدد المشتركين:* {subscribers_count}\n\n"
     
     # أكثر المصادر نشاطاً
     text += "🔝 *أكثر المصادر نشاطاً:*\n"
@@ -142,7 +180,7 @@ async def stats_callback(update, context):
 async def start_command(update, context):
     """بدء البوت والاشتراك في الإشعارات."""
     user = update.effective_user
-    added = notification_manager.add_user(user.id)
+    added = await notification_manager.add_user(user.id)
     
     if added:
         await update.message.reply_text(
@@ -161,7 +199,7 @@ async def start_command(update, context):
 async def subscribe_command(update, context):
     """الاشتراك في نظام الإشعارات."""
     user = update.effective_user
-    added = notification_manager.add_user(user.id)
+    added = await notification_manager.add_user(user.id)
     
     if added:
         await update.message.reply_text("تم اشتراكك في نظام الإشعارات بنجاح. ✅")
@@ -171,7 +209,7 @@ async def subscribe_command(update, context):
 async def unsubscribe_command(update, context):
     """إلغاء الاشتراك من نظام الإشعارات."""
     user = update.effective_user
-    removed = notification_manager.remove_user(user.id)
+    removed = await notification_manager.remove_user(user.id)
     
     if removed:
         await update.message.reply_text("تم إلغاء اشتراكك من نظام الإشعارات بنجاح. ✅\n\nيمكنك الاشتراك مجدداً في أي وقت باستخدام الأمر /start")
@@ -192,13 +230,39 @@ async def trends_command(update, context):
     
     await update.message.reply_text(text, parse_mode=ParseMode.MARKDOWN)
 
+async def on_startup(application):
+    """تهيئة الموارد المشتركة قبل بدء الجدولة"""
+    from database import init_db
+
+    # إنشاء الجداول مرة واحدة عند بدء التشغيل
+    await asyncio.to_thread(init_db)
+
+    # تهيئة فهرس الروابط المعروفة من قاعدة البيانات
+    await asyncio.to_thread(seen_links.warm)
+
+    # تشغيل الكاتب الوحيد لقاعدة البيانات
+    db_writer.start()
+
+    # تحويل معرف القناة مرة واحدة وتخزينه في الذاكرة وقاعدة البيانات
+    await get_channel_id(application.bot, TELEGRAM_CHANNEL_ID)
+
+    # تشغيل الناشر المستقل (يكمل العناصر المعلقة من التشغيل السابق)
+    outbox_publisher.start(functools.partial(publish_article, application.bot))
+
+async def on_shutdown(application):
+    """تحرير الموارد المشتركة عند إيقاف البوت"""
+    await outbox_publisher.stop()
+    await db_writer.stop()
+    await http_client.close()
+    cpu_pool.shutdown()
+
 def main() -> None:
     """Run the bot."""
     # إعداد نظام تسجيل الأخطاء
     setup_error_logging()
     
     # إنشاء التطبيق
-    application = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
+    application = Application.builder().token(TELEGRAM_BOT_TOKEN).post_init(on_startup).post_shutdown(on_shutdown).build()
 
     # إضافة معالجات الأوامر
     application.add_handler(CommandHandler("start", start_command))
@@ -215,13 +279,14 @@ def main() -> None:
     # جدولة مهمة جمع الأخبار كل 30 ثانية
     job_queue = application.job_queue
     if job_queue is not None:
-        job_queue.run_repeating(fetch_and_send_news, interval=30, first=10) # 30 seconds
+        # max_instances=2 حتى يصل التشغيل المتداخل إلى fetch_guard فيُسجل ويُدمج بدل تجاهله بصمت
+        job_queue.run_repeating(run_fetch_cycle, interval=30, first=10, job_kwargs={'max_instances': 2}) # 30 seconds
         
         # جدولة تنظيف التخزين المؤقت كل ساعة
         job_queue.run_repeating(lambda context: cache_manager.clear_old_cache(), interval=3600, first=3600)
         
         logger.info("🚀 بوت أخبار الجزائر بدأ العمل تلقائياً...")
-        logger.info("📰 سيتم جلب الأخبار فور صدورها ونشرها كل 30 ثانية")
+        logger.info("📰 سيتم فحص المصادر كل 30 ثانية وجلب كل مصدر حسب معدل نشره")
         logger.info("🗂️ سيتم تنظيف التخزين المؤقت كل ساعة")
         
         # إرسال رسالة تجريبية للتأكد من أن البوت يمكنه الكتابة في القناة
@@ -277,7 +342,7 @@ def main() -> None:
                     
                     context = SimpleContext(application.bot)
                     logger.info("🔄 APScheduler: استدعاء fetch_and_send_news...")
-                    await fetch_and_send_news(context)
+                    await run_fetch_cycle(context)
                     logger.info("✅ APScheduler: انتهاء دورة جلب الأخبار بنجاح")
                 except Exception as e:
                     logger.error(f"❌ خطأ في fetch_news_wrapper: {e}")
@@ -297,12 +362,14 @@ def main() -> None:
                 fetch_news_wrapper,
                 IntervalTrigger(seconds=30),
                 id='fetch_news',
-                replace_existing=True
+                replace_existing=True,
+                coalesce=True,
+                max_instances=2  # التداخل يُعالج في fetch_guard
             )
             
             # جدولة تنظيف التخزين المؤقت كل ساعة
             scheduler.add_job(
-                lambda: cache_manager.clear_old_cache(),
+                cache_manager.clear_old_cache,
                 IntervalTrigger(hours=1),
                 id='clear_cache',
                 replace_existing=True
@@ -310,7 +377,7 @@ def main() -> None:
             
             scheduler.start()
             logger.info("🚀 بوت أخبار الجزائر بدأ العمل مع APScheduler...")
-            logger.info("📰 سيتم جلب الأخبار فور صدورها ونشرها كل 30 ثانية")
+            logger.info("📰 سيتم فحص المصادر كل 30 ثانية وجلب كل مصدر حسب معدل نشره")
             logger.info("🗂️ سيتم تنظيف التخزين المؤقت كل ساعة")
             
             # إرسال رسالة تجريبية للتأكد من أن البوت يمكنه الكتابة في القناة
@@ -353,126 +420,117 @@ def main() -> None:
     # تشغيل البوت حتى يضغط المستخدم Ctrl-C
     application.run_polling()
 
-def diversify_articles_by_source(articles):
-    """تنويع المقالات لتجنب التكرار من نفس المصدر متتالياً."""
-    if not articles:
-        return []
-    
-    # تجميع المقالات حسب المصدر
-    articles_by_source = {}
-    for article in articles:
-        source_name = article.source
-        if source_name not in articles_by_source:
-            articles_by_source[source_name] = []
-        articles_by_source[source_name].append(article)
-    
-    # ترتيب المصادر حسب عدد المقالات (الأقل أولاً لضمان التنويع)
-    sorted_sources = sorted(articles_by_source.keys(), 
-                           key=lambda x: len(articles_by_source[x]))
-    
-    # توزيع المقالات بالتناوب بين المصادر
-    diversified = []
-    max_articles = max(len(articles_by_source[source]) for source in sorted_sources)
-    
-    for i in range(max_articles):
-        for source in sorted_sources:
-            if i < len(articles_by_source[source]):
-                diversified.append(articles_by_source[source][i])
-    
-    return diversified
-
-async def process_source(source, session):
-    """معالجة مصدر أخبار واحد لجلب وحفظ المقالات الجديدة."""
-    from rss_parser import parse_rss_feed
-    from web_scraper import scrape_website, scrape_article_content
+async def process_source(source):
+    """
+    معالجة مصدر أخبار واحد لجلب المقالات الجديدة (يتم حفظها لاحقاً عبر db_writer).
+    ترجع (المقالات الجديدة، رابط الخلاصة الذي تنتظر بيانات تحققه الحفظ أو None)؛
+    بيانات التحقق تُحفظ فقط بعد نجاح حفظ المقالات.
+    """
+    from rss_parser import parse_rss_feed, feed_state_store
+    from web_scraper import scrape_website, fetch_article_page
     from database import Article
-    from nlp_analyzer import news_analyzer
-    from classifier import classify_article
-    from media_handler import extract_video_url
+    from article_records import build_article_records
 
     new_articles = []
+    feed_url = source.get('url') if source.get('type') == 'rss' else None
     try:
         logger.info(f"معالجة المصدر: {source['name']} - الأولوية: {source.get('priority', 'غير محددة')}")
         
         articles_data = []
         if source['type'] == 'rss':
-            articles_data = parse_rss_feed(source['url'])
+            if not feed_url:
+                logger.warning(f"المصدر {source['name']} لا يحتوي على رابط خلاصة RSS، تم تجاهله")
+                return new_articles, None
+            articles_data = await parse_rss_feed(feed_url)
         elif source['type'] == 'scrape':
-            articles_data = scrape_website(source)
+            articles_data = await scrape_website(source)
 
         # فلترة المقالات حسب التاريخ (آخر 24 ساعة فقط)
         twenty_four_hours_ago = datetime.datetime.utcnow() - datetime.timedelta(hours=24)
         
+        # فلترة الأخبار القديمة (أكثر من 24 ساعة) وإزالة الروابط المكررة داخل الخلاصة
+        candidates = {}
         for article_data in articles_data:
-            # التحقق من عدم وجود المقال مسبقاً
-            exists = session.query(Article).filter_by(link=article_data['link']).first()
-            if not exists:
-                # فلترة الأخبار القديمة (أكثر من 24 ساعة)
-                if article_data['published_date'] < twenty_four_hours_ago:
-                    logger.debug(f"تجاهل مقال قديم: {article_data['title']}")
-                    continue
-                    
-                logger.info(f"معالجة مقال جديد: {article_data['title']}")
-
-                # استخراج المحتوى الكامل
-                full_content = scrape_article_content(article_data['link'], source.get('scraping_config'))
-                summary = full_content if full_content else article_data['summary']
-                
-                # تصنيف المقال
-                category = classify_article(article_data['title'], summary)
-                
-                # إذا كان المصدر له فئة محددة، استخدمها
-                if 'category' in source:
-                    category = source['category']
-                
-                # تحليل المشاعر
-                sentiment_score = news_analyzer.analyze_sentiment(article_data['title'] + " " + summary)
-
-                # إنشاء مقال جديد
-                new_article = Article(
-                    title=article_data['title'],
-                    sentiment_score=sentiment_score,
-                    link=article_data['link'],
-                    source=article_data['source_name'],
-                    published_date=article_data['published_date'],
-                    category=category,
-                    image_url=article_data.get('image_url', ''),
-                    summary=summary
-                )
-                session.add(new_article)
-                new_articles.append(new_article)
+            if article_data['published_date'] < twenty_four_hours_ago:
+                logger.debug(f"تجاهل مقال قديم: {article_data['title']}")
+                continue
+            candidates.setdefault(article_data['link'], article_data)
+
+        # التحقق من عدم وجود المقالات مسبقاً دفعة واحدة (الذاكرة أولاً ثم استعلام واحد خارج event loop)
+        new_links = await asyncio.to_thread(seen_links.filter_new, list(candidates))
+        fresh_articles = [article_data for link, article_data in candidates.items() if link in new_links]
+
+        # تحميل صفحة كل مقال جديد مرة واحدة: المحتوى والصورة والفيديو وتاريخ النشر
+        pages = await asyncio.gather(*[
+            fetch_article_page(article_data['link'], source)
+            for article_data in fresh_articles
+        ])
+
+        # التصنيف وتحليل المشاعر في مجموعة العمليات، ثم إنشاء المقالات من السجلات الناتجة
+        records = []
+        if fresh_articles:
+            records = await cpu_pool.run(build_article_records, list(zip(fresh_articles, pages)), source)
+        for record in records:
+            logger.info(f"معالجة مقال جديد: {record['title']}")
+            new_articles.append(Article(**record))
+
+        # تحميل الصور مسبقاً إلى التخزين المؤقت حتى لا يحتاج الإرسال إلا إلى التليجرام
+        await asyncio.gather(*[
+            cache_manager.get_cached_image(get_article_image(article.image_url, article.video_url))
+            for article in new_articles
+        ])
 
         if new_articles:
-            session.flush() # Flush to get IDs for new articles
-            for article in new_articles:
-                session.refresh(article) # Refresh to get the ID
             logger.info(f"تم العثور على {len(new_articles)} مقال جديد من {source['name']}")
         else:
             logger.debug(f"لا توجد مقالات جديدة من {source['name']}")
+
+        # بيانات التحقق (ETag/Last-Modified) تُحفظ بعد حفظ المقالات في fetch_and_send_news
+        return new_articles, feed_url
             
     except Exception as e:
-        log_error(e, f"خطأ في معالجة المصدر: {source['name']}")
-        error_stats.record_error(e, f"source_{source['name']}")
-        logger.error(f"فشل في معالجة المصدر {source['name']}: {str(e)}")
+        if feed_url:
+            feed_state_store.discard(feed_url)
+        source_name = source.get('name', feed_url)
+        log_error(e, f"خطأ في معالجة المصدر: {source_name}")
+        error_stats.record_error(e, f"source_{source_name}")
+        logger.error(f"فشل في معالجة المصدر {source_name}: {str(e)}")
     
-    return new_articles
+    return new_articles, None
+
+async def run_fetch_cycle(context):
+    """تشغيل دورة الجلب مع منع التداخل (fetch_guard) وتسجيل مدة كل دورة"""
+    await fetch_guard.run(fetch_and_send_news, context)
 
 async def fetch_and_send_news(context):
     """جلب الأخبار من المصادر وإرسالها للتليجرام مع تطبيق الأولويات والتنويع."""
     from sources import NEWS_SOURCES, get_source_by_name
-    from database import get_db_session, get_random_unsent_high_sentiment_article
+    from database import get_random_unsent_high_sentiment_article, insert_articles, enqueue_articles, get_outbox_stats
+    from rss_parser import feed_state_store
+
+    # اختيار المصادر التي حان موعد جلبها فقط حسب معدل نشر كل مصدر
+    due_sources = source_scheduler.get_due_sources(NEWS_SOURCES)
+    if not due_sources:
+        logger.debug("لا توجد مصادر حان موعد جلبها في هذه الدورة")
+        return
 
     logger.info("🔄 بدء دورة جلب الأخبار الجديدة...")
-    logger.info(f"📊 عدد المصادر: {len(NEWS_SOURCES)}")
-    session = get_db_session()
+    logger.info(f"📊 عدد المصادر المستحقة: {len(due_sources)} من {len(NEWS_SOURCES)}")
     
     # معالجة المصادر بشكل متزامن على نفس event loop
-    tasks = [process_source(source, session) for source in NEWS_SOURCES]
+    tasks = [process_source(source) for source in due_sources]
     logger.info(f"🚀 بدء معالجة {len(tasks)} مصدر بشكل متزامن...")
     results = await asyncio.gather(*tasks)
+    pending_feeds = [feed_url for _, feed_url in results if feed_url]
+
+    # تحديث جدولة كل مصدر حسب الأخبار الجديدة التي تمت ملاحظتها
+    # التواريخ التقديرية (وقت الجلب) لا تمثل معدل النشر الحقيقي فلا تدخل في حساب الفواصل
+    for source, (source_articles, _) in zip(due_sources, results):
+        entry_times = [article.published_date for article in source_articles if not article.published_date_estimated]
+        source_scheduler.record_poll(source, entry_times, estimated_count=len(source_articles) - len(entry_times))
     
     # تجميع جميع المقالات الجديدة
-    all_new_articles = [article for sublist in results for article in sublist]
+    all_new_articles = [article for source_articles, _ in results for article in source_articles]
     logger.info(f"📰 تم العثور على {len(all_new_articles)} مقال جديد من جميع المصادر")
     
     # فلترة الأخبار للـ 24 ساعة الماضية فقط
@@ -481,94 +539,47 @@ async def fetch_and_send_news(context):
                       if article.published_date >= twenty_four_hours_ago]
     
     logger.info(f"⏰ تم فلترة {len(recent_articles)} مقال من آخر 24 ساعة")
-    
+
     if recent_articles:
-        session.commit()
+        # إضافة دفعة واحدة؛ الروابط المكررة (بين المصادر أو من دورة متزامنة) يتم تجاهلها
+        try:
+            recent_articles = await db_writer.submit(insert_articles, recent_articles)
+        except Exception:
+            # بدون بيانات التحقق الجديدة تُعاد قراءة الخلاصات كاملة في الدورة القادمة
+            for feed_url in pending_feeds:
+                feed_state_store.discard(feed_url)
+            raise
+        seen_links.add(article.link for article in recent_articles)
         logger.info(f"✅ تم حفظ {len(recent_articles)} مقال جديد في قاعدة البيانات")
-    else:
-        session.rollback()
+
+    # حفظ بيانات التحقق (ETag/Last-Modified) بعد حفظ المقالات فقط
+    for feed_url in pending_feeds:
+        await feed_state_store.confirm(feed_url)
+
+    if not recent_articles:
         logger.info("❌ لم يتم العثور على أخبار جديدة خلال آخر 24 ساعة")
         return  # خروج مبكر إذا لم تكن هناك أخبار جديدة
 
     # ترتيب وتنويع الأخبار حسب الأولوية
     if recent_articles:
-        # تصنيف الأخبار حسب الأولوية
-        urgent_news = []
-        local_news = []  # أخبار محلية جزائرية
-        official_news = []
-        economic_news = []
-        sports_news = []
-        other_news = []
-
-        urgent_keywords = ['عاجل', 'طارئ', 'انفجار', 'حادث', 'وفاة', 'استقالة', 'إعلان هام', 'قرار عاجل']
-        
+        # طابور أولوية: الاستعجال والبلد والفئة وأولوية المصدر، مع الترقية بالعمر والتناوب بين المصادر
+        rank_counts = Counter()
         for article in recent_articles:
-            title_lower = article.title.lower()
-            source_country = get_source_by_name(article.source).get('country', 'Unknown')
-
-            if any(keyword in title_lower for keyword in urgent_keywords):
-                urgent_news.append(article)
-            elif source_country == 'DZ':
-                local_news.append(article)
-            elif article.category == 'official':
-                official_news.append(article)
-            elif article.category in ['economic', 'اقتصاد']:
-                economic_news.append(article)
-            elif article.category in ['sports', 'رياضة']:
-                sports_news.append(article)
-            else:
-                other_news.append(article)
+            source_config = get_source_by_name(article.source)
+            rank = article_rank(article, source_config)
+            rank_counts[rank] += 1
+            article_queue.push(article, rank, source_config.get('priority'))
 
-        # ترتيب الأخبار حسب الأولوية مع التنويع
-        prioritized_articles = []
-        prioritized_articles.extend(urgent_news)
-        prioritized_articles.extend(diversify_articles_by_source(local_news))
-        
-        remaining_articles = official_news + economic_news + other_news + sports_news
-        diversified_articles = diversify_articles_by_source(remaining_articles)
-        prioritized_articles.extend(diversified_articles)
+        # مفتاح الترتيب يُحفظ في صندوق الإرسال، والناشر يسحب الأصغر أولاً
+        outbox_entries = [(article.id, int(key)) for key, article in article_queue.drain()]
 
-        logger.info(f"إرسال {len(prioritized_articles)} مقال مع ترتيب الأولوية والتنويع")
-        logger.info(f"الأخبار العاجلة: {len(urgent_news)}, المحلية: {len(local_news)}, الرسمية: {len(official_news)}, الاقتصادية: {len(economic_news)}, الرياضية: {len(sports_news)}, أخرى: {len(other_news)}")
-        
-        # إرسال المقالات مع فترات زمنية مناسبة
-        # أولاً: إرسال الأخبار العاجلة المحلية فقط كل 30 ثانية
-        urgent_local_news = [a for a in urgent_news if a in local_news]
-        other_news = [a for a in prioritized_articles if a not in urgent_local_news]
+        logger.info(f"إضافة {len(outbox_entries)} مقال إلى صندوق الإرسال مع ترتيب الأولوية والتنويع")
+        logger.info(f"الأخبار العاجلة: {rank_counts[RANK_URGENT]}, المحلية: {rank_counts[RANK_LOCAL]}, الرسمية: {rank_counts[RANK_OFFICIAL]}, الاقتصادية: {rank_counts[RANK_ECONOMIC]}, الرياضية: {rank_counts[RANK_SPORTS]}, أخرى: {rank_counts[RANK_OTHER]}")
 
-        logger.info(f"بدء إرسال {len(urgent_local_news)} خبر عاجل محلي")
-        for i, article in enumerate(urgent_local_news):
-            try:
-                logger.info(f"إرسال الخبر العاجل المحلي {i+1}/{len(urgent_local_news)}: {article.title}")
-                await send_article_to_telegram(context.bot, article)
-                article.sent_to_telegram = True
-                session.commit()
-                bot_stats.add_article(article.source, article.category)
-                await notification_manager.notify_users(article, article.category)
-                logger.info(f"✅ تم إرسال الخبر العاجل المحلي: {article.title}")
-                logger.info("انتظار 30 ثانية (خبر عاجل محلي) قبل إرسال الخبر التالي")
-                await asyncio.sleep(30)
-            except Exception as e:
-                log_error(e, f"فشل في معالجة المقال: {article.title}")
-                error_stats.record_error(e, "send_article_loop")
-                session.rollback()
+        # الإرسال يتم عبر الناشر المستقل، فلا ينتظر الجلب زمن الإرسال
+        await db_writer.submit(enqueue_articles, outbox_entries)
+        outbox_publisher.wake()
 
-        logger.info(f"بدء إرسال {len(other_news)} خبر آخر")
-        # ثم: إرسال بقية الأخبار (العالمية والمحلية غير العاجلة) بفاصل 30 ثانية بين كل خبر
-        for i, article in enumerate(other_news):
-            try:
-                logger.info(f"إرسال الخبر {i+1}/{len(other_news)}: {article.title}")
-                await send_article_to_telegram(context.bot, article)
-                article.sent_to_telegram = True
-                session.commit()
-                bot_stats.add_article(article.source, article.category)
-                await notification_manager.notify_users(article, article.category)
-                logger.info("انتظار 30 ثانية قبل إرسال الخبر التالي")
-                await asyncio.sleep(30)
-            except Exception as e:
-                log_error(e, f"فشل في معالجة المقال: {article.title}")
-                error_stats.record_error(e, "send_article_loop")
-                session.rollback()
     logger.info(f"انتهاء دورة جلب الأخبار. تم العثور على {len(recent_articles) if recent_articles else 0} مقال جديد")
     
     # تسجيل إحصائيات الأخطاء
@@ -576,19 +587,30 @@ async def fetch_and_send_news(context):
     if error_summary['total_errors'] > 0:
         logger.warning(f"إجمالي الأخطاء في هذه الدورة: {error_summary['total_errors']}")
 
-    # إذا لم يتم العثور على أخبار جديدة، جرب إرسال مقال عشوائي بمشاعر إيجابية
-    if not recent_articles:
+    # إذا لم يتم العثور على أخبار جديدة وصندوق الإرسال فارغ، نضيف مقالاً عشوائياً بمشاعر إيجابية
+    if not recent_articles and (await asyncio.to_thread(get_outbox_stats))['depth'] == 0:
         logger.info("لم يتم العثور على أخبار جديدة. البحث عن مقالات غير مرسلة بمشاعر إيجابية...")
-        session = get_db_session()
-        random_article = get_random_unsent_high_sentiment_article(session)
+        random_article = await asyncio.to_thread(get_random_unsent_high_sentiment_article)
         if random_article:
-            logger.info(f"إرسال مقال عشوائي بمشاعر إيجابية: {random_article.title}")
-            await send_article_to_telegram(context.bot, random_article)
-            random_article.sent_to_telegram = True # Mark as sent
-            session.commit()
+            logger.info(f"إضافة مقال عشوائي بمشاعر إيجابية إلى صندوق الإرسال: {random_article.title}")
+            article_queue.push(random_article, RANK_OTHER)
+            key, _ = article_queue.pop()
+            await db_writer.submit(enqueue_articles, [(random_article.id, int(key))])
+            outbox_publisher.wake()
         else:
             logger.info("No high-sentiment unsent articles found in the last 24 hours.")
-        session.close()
+
+async def publish_article(bot, article):
+    """نشر مقال من صندوق الإرسال في القناة ثم تحديث الإحصائيات وإشعار المشتركين"""
+    if not await send_article_to_telegram(bot, article):
+        return False
+    try:
+        await bot_stats.add_article(article.source, article.category)
+        await notification_manager.notify_users(article, article.category)
+    except Exception as e:
+        log_error(e, f"فشل في تحديث الإحصائيات أو الإشعارات للمقال: {article.title}")
+        error_stats.record_error(e, "publish_article")
+    return True
 
 async def read_more_callback(update: Update, context: CallbackContext):
     """Callback function for the 'Read More' button."""
@@ -601,11 +623,15 @@ async def read_more_callback(update: Update, context: CallbackContext):
         await query.answer(text="خطأ داخلي في قراءة المزيد.", show_alert=True)
         return
 
-    from database import get_db_session, Article
-    session = get_db_session()
-    article = session.query(Article).filter_by(id=article_id_int).first()
+    from database import session_scope, Article
+
+    def load_article():
+        with session_scope() as session:
+            return session.query(Article).filter_by(id=article_id_int).first()
+
+    # القراءة في خيط منفصل حتى لا تنتظر خلف عمليات الإرسال
+    article = await asyncio.to_thread(load_article)
     logger.info(f"زر قراءة المزيد: article_id={article_id}, موجود في قاعدة البيانات: {bool(article)}")
-    session.close()
 
     if article:
         await query.answer()
@@ -618,8 +644,14 @@ async def read_more_callback(update: Update, context: CallbackContext):
     else:
         await query.answer(text="عذراً، لم يتم العثور على هذا الخبر.", show_alert=True)
 
+def get_article_image(image_url, video_url):
+    """الصورة المرسلة مع الخبر: صورة المقال، أو صورة فيديو يوتيوب المصغرة إذا لم توجد"""
+    if not image_url and video_url and is_youtube_url(video_url):
+        return get_video_thumbnail(video_url)
+    return image_url
+
 async def send_article_to_telegram(bot, article):
-    """تنسيق وإرسال مقال واحد إلى قناة التليجرام مع عرض محسن للمحتوى."""
+    """تنسيق وإرسال مقال واحد إلى قناة التليجرام مع عرض محسن للمحتوى. يرجع True عند النجاح ويعيد رفع RetryAfter."""
     logger.info(f"🚀 بدء إرسال المقال: {article.title}")
     
     from classifier import classify_article, get_emoji_for_category
@@ -634,7 +666,7 @@ async def send_article_to_telegram(bot, article):
     from sources import get_source_by_name
     source_config = get_source_by_name(article.source)
     unwanted_phrases = source_config.get('scraping_config', {}).get('unwanted_phrases', [])
-    content = prepare_article_content(article.summary, article.title, unwanted_phrases)
+    content = await cpu_pool.run(prepare_article_content, article.summary, article.title, unwanted_phrases)
 
     # إنشاء الهاشتاجات
     hashtags = create_hashtags(article.title, content, article.source, category)
@@ -654,25 +686,26 @@ async def send_article_to_telegram(bot, article):
     logger.info(f"📝 تم تنسيق الرسالة للمقال: {title}")
 
     try:
-        # التحقق من وجود محتوى مرئي (فيديو أو صورة)
-        video_url = extract_video_url(article.link)
+        # الفيديو مستخرج مسبقاً من صفحة المقال عند الجلب (لا طلبات شبكة هنا سوى التليجرام)
+        video_url = article.video_url
         has_media = bool(article.image_url or video_url)
         
         # إذا كان هناك فيديو مباشر (ليس يوتيوب)، نرسله مع النص
         if video_url and not is_youtube_url(video_url):
             try:
-                # تحويل معرف القناة إذا لزم الأمر
-                channel_id = await get_channel_id(bot, TELEGRAM_CHANNEL_ID)
                 logger.info(f"📹 إرسال فيديو مباشر للمقال: {title}")
                 
-                await bot.send_video(
-                    chat_id=channel_id,
+                await send_to_channel(
+                    bot,
+                    bot.send_video,
                     video=video_url,
                     caption=text,
                     parse_mode=ParseMode.HTML
                 )
                 logger.info(f"✅ تم إرسال مقال مع فيديو: {title}")
-                return
+                return True
+            except RetryAfter:
+                raise
             except Exception as e:
                 logger.error(f"❌ فشل في إرسال الفيديو للمقال {title}: {e}")
                 # في حالة فشل إرسال الفيديو، نستمر لإرسال الخبر مع الصورة أو بدونها
@@ -681,21 +714,24 @@ async def send_article_to_telegram(bot, article):
         if video_url and is_youtube_url(video_url):
             text += f"\n\n🎬 <a href='{video_url}'>شاهد الفيديو</a>"
         
-        # إذا كان هناك صورة، نرسلها مع الخبر
-        image_url = article.image_url
+        # إذا كان هناك صورة، نرسلها مع الخبر (أو صورة فيديو يوتيوب المصغرة)
+        image_url = get_article_image(article.image_url, video_url)
         
-        # إذا لم تكن هناك صورة ولكن هناك فيديو يوتيوب، نستخدم صورة الفيديو المصغرة
-        if not image_url and video_url and is_youtube_url(video_url):
-            image_url = get_video_thumbnail(video_url)
-        
-        # استخدام التخزين المؤقت للصور
+        # استخدام التخزين المؤقت للصور (تم تحميلها مسبقاً عند الجلب)
         if image_url:
-            cached_image = cache_manager.get_cached_image(image_url)
+            cached_image = await cache_manager.get_cached_image(image_url)
             image_url = cached_image
         
         logger.info(f"📤 إرسال المقال عبر _send_telegram_message: {title}")
         await _send_telegram_message(bot, image_url, text, title, category, article.id, parse_mode=ParseMode.HTML)
         logger.info(f"✅ تم إرسال المقال بنجاح: {title}")
+        return True
+
+    except RetryAfter as e:
+        # محدد المعدل أوقف الإرسال المدة التي طلبها التليجرام؛ الناشر يعيد المقال دون احتساب محاولة فاشلة
+        error_stats.record_error(e, "send_article_to_telegram")
+        logger.error(f"❌ تجاوز حد الإرسال للمقال: {title} - سيعاد إرساله بعد انتهاء الإيقاف")
+        raise
         
     except Exception as e:
         log_error(e, f"send_article_to_telegram: {title}")
@@ -706,13 +742,15 @@ async def send_article_to_telegram(bot, article):
             logger.info(f"🔄 محاولة إرسال المقال بدون صورة: {title}")
             await _send_telegram_message(bot, None, text, title, category, article.id)
             logger.info(f"✅ تم إرسال المقال بدون صورة: {title}")
+            return True
         except Exception as e2:
             log_error(e2, f"send_article_to_telegram_fallback: {title}")
             error_stats.record_error(e2, "send_article_to_telegram_fallback")
             logger.error(f"❌ فشل في إرسال المقال بدون صورة: {title} - {e2}")
+            return False
 
-@handle_telegram_error
-@retry_on_failure(max_retries=2)
+@handle_telegram_error(flood_controlled=True)
+@retry_on_failure(max_retries=2, flood_controlled=True)
 async def _send_telegram_message(bot, image_url, text, title, category, article_id, parse_mode=ParseMode.HTML):
     """إرسال رسالة إلى التليجرام مع معالجة الأخطاء"""
     logger.info(f"📨 بدء _send_telegram_message للمقال: {title}")
@@ -721,16 +759,14 @@ async def _send_telegram_message(bot, image_url, text, title, category, article_
         keyboard = [[InlineKeyboardButton("📰 قراءة المزيد", callback_data=f'read_more:{article_id}')]]
         reply_markup = InlineKeyboardMarkup(keyboard)
 
-        # تحويل معرف القناة إذا لزم الأمر
-        channel_id = await get_channel_id(bot, TELEGRAM_CHANNEL_ID)
-        logger.info(f"📢 إرسال إلى القناة: {channel_id}")
+        logger.info(f"📢 إرسال إلى القناة: {TELEGRAM_CHANNEL_ID}")
 
         if image_url:
             # إرسال الصورة مع النص
             logger.info(f"🖼️ إرسال مقال مع صورة: {title}")
-            await bot.send_photo(
-                chat_id=channel_id,
-                photo=image_url,
+            await send_photo_to_channel(
+                bot,
+                image_url,
                 caption=text,
                 parse_mode=parse_mode,
                 reply_markup=reply_markup
@@ -739,29 +775,34 @@ async def _send_telegram_message(bot, image_url, text, title, category, article_
         else:
             # إرسال نص فقط مع معاينة الرابط
             logger.info(f"📝 إرسال مقال نصي: {title}")
-            await bot.send_message(
-                chat_id=channel_id,
+            await send_to_channel(
+                bot,
+                bot.send_message,
                 text=text,
                 parse_mode=parse_mode,
                 disable_web_page_preview=False,  # إظهار معاينة الرابط
                 reply_markup=reply_markup
             )
             logger.info(f"✅ تم إرسال مقال نصي: {title} (الفئة: {category})")
+    except RetryAfter:
+        # محدد المعدل استنفد محاولاته: لا إرسال بديل
+        raise
     except Exception as e:
         logger.error(f"❌ خطأ في _send_telegram_message للمقال {title}: {e}")
         # محاولة إرسال بدون reply_markup في حالة فشل
         try:
             logger.info(f"🔄 محاولة إرسال بدون reply_markup: {title}")
             if image_url:
-                await bot.send_photo(
-                    chat_id=channel_id,
-                    photo=image_url,
+                await send_photo_to_channel(
+                    bot,
+                    image_url,
                     caption=text,
                     parse_mode=parse_mode
                 )
             else:
-                await bot.send_message(
-                    chat_id=channel_id,
+                await send_to_channel(
+                    bot,
+                    bot.send_message,
                     text=text,
                     parse_mode=parse_mode,
                     disable_web_page_preview=False
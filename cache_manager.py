@@ -1,142 +1,333 @@
 # cache_manager.py
 
 import os
+import asyncio
 import hashlib
 import time
 import logging
-import requests
+from collections import OrderedDict
 from pathlib import Path
-from config import CACHE_ENABLED, CACHE_DURATION, CACHE_DIR, REQUEST_TIMEOUT
+from config import (
+    CACHE_ENABLED, CACHE_DURATION, CACHE_DIR, CACHE_MAX_BYTES,
+    IMAGE_MAX_BYTES, IMAGE_NORMALIZE, IMAGE_MAX_SIDE, IMAGE_FORMAT, IMAGE_QUALITY
+)
+from http_client import http_client, STREAM_CHUNK_SIZE
+from error_handler import HTTPStatusError, KnownBadURLError
+from cpu_pool import cpu_pool
+import image_normalizer
 
 logger = logging.getLogger(__name__)
 
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp')
+TEMP_SUFFIX = '.part'  # ملف التحميل الجاري، يُنقل إلى اسمه النهائي بعد اكتماله
+NORMALIZED_TEMP_SUFFIX = '.normalized' + TEMP_SUFFIX
+CLEANUP_BATCH_SIZE = 100  # عدد الملفات التي تُحذف في كل دفعة أثناء التنظيف
+
+class CacheEntry:
+    """ملف واحد في التخزين المؤقت"""
+    __slots__ = ('path', 'size', 'created_at', 'last_access')
+
+    def __init__(self, path: Path, size: int, created_at: float, last_access: float):
+        self.path = path
+        self.size = size
+        self.created_at = created_at
+        self.last_access = last_access
+
 class CacheManager:
-    def __init__(self):
+    def __init__(self, max_bytes: int = CACHE_MAX_BYTES, max_image_bytes: int = IMAGE_MAX_BYTES):
         self.cache_dir = Path(CACHE_DIR)
         self.cache_enabled = CACHE_ENABLED
         self.cache_duration = CACHE_DURATION
-        
+        self.max_bytes = max_bytes
+        # حد الصورة الواحدة أصغر بكثير من حجم التخزين كله، فلا تطرد صورة واحدة بقية الملفات
+        self.max_image_bytes = min(max_image_bytes, max_bytes)
+        self.normalize_images = IMAGE_NORMALIZE and image_normalizer.is_available()
+        # فهرس في الذاكرة: المفتاح -> CacheEntry، مرتب من الأقل استخداماً إلى الأحدث (LRU)
+        self._index = OrderedDict()
+        self._index_loaded = False
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.shared_downloads = 0
+        self.normalized = 0
+        self.bytes_saved = 0
+        self._downloads = {}  # المفتاح -> مهمة التحميل الجارية
+
         # إنشاء مجلد التخزين المؤقت إذا لم يكن موجوداً
         if self.cache_enabled:
             self.cache_dir.mkdir(exist_ok=True)
             logger.info(f"Cache manager initialized. Cache dir: {self.cache_dir}")
-    
+
     def _get_cache_key(self, url: str) -> str:
         """إنشاء مفتاح فريد للرابط"""
         return hashlib.md5(url.encode()).hexdigest()
-    
+
     def _get_cache_path(self, cache_key: str, extension: str = '') -> Path:
         """الحصول على مسار ملف التخزين المؤقت"""
         filename = f"{cache_key}{extension}"
         return self.cache_dir / filename
-    
-    def _is_cache_valid(self, cache_path: Path) -> bool:
-        """التحقق من صحة ملف التخزين المؤقت"""
-        if not cache_path.exists():
-            return False
-        
-        # التحقق من عمر الملف
-        file_age = time.time() - cache_path.stat().st_mtime
-        return file_age < self.cache_duration
-    
-    def get_cached_image(self, url: str) -> str:
-        """الحصول على الصورة من التخزين المؤقت أو تحميلها"""
+
+    def _scan_cache_dir(self) -> OrderedDict:
+        """قراءة الملفات الموجودة على القرص مرة واحدة لبناء الفهرس (مرتبة حسب آخر استخدام)"""
+        entries = []
+        for file_path in self.cache_dir.iterdir():
+            if file_path.suffix == TEMP_SUFFIX:
+                # تحميل لم يكتمل قبل إيقاف البوت
+                file_path.unlink(missing_ok=True)
+                continue
+            if not file_path.is_file() or file_path.suffix.lower() not in IMAGE_EXTENSIONS:
+                continue
+            stat = file_path.stat()
+            entries.append((file_path.stem, CacheEntry(
+                file_path, stat.st_size, stat.st_mtime, max(stat.st_atime, stat.st_mtime)
+            )))
+        entries.sort(key=lambda item: item[1].last_access)
+        return OrderedDict(entries)
+
+    def _load_index(self, index: OrderedDict):
+        if self._index_loaded:
+            return
+        self._index = index
+        self.total_bytes = sum(entry.size for entry in index.values())
+        self._index_loaded = True
+        logger.info(f"Cache index loaded: {len(index)} files, {self.total_bytes} bytes")
+
+    async def _ensure_index(self):
+        """بناء الفهرس من القرص عند أول استخدام (في خيط منفصل)"""
+        if not self._index_loaded:
+            self._load_index(await asyncio.to_thread(self._scan_cache_dir))
+
+    def _is_expired(self, entry: CacheEntry, now: float) -> bool:
+        return now - entry.created_at >= self.cache_duration
+
+    def _remove_entry(self, cache_key: str) -> CacheEntry:
+        """إزالة مدخل من الفهرس (حذف الملف يتم لاحقاً بواسطة المستدعي)"""
+        entry = self._index.pop(cache_key)
+        self.total_bytes -= entry.size
+        return entry
+
+    def _add_entry(self, cache_key: str, path: Path, size: int) -> list:
+        """إضافة ملف جديد إلى الفهرس وإرجاع الملفات التي يجب حذفها للبقاء ضمن الحجم الأقصى"""
+        if cache_key in self._index:
+            self._remove_entry(cache_key)
+        now = time.time()
+        self._index[cache_key] = CacheEntry(path, size, now, now)
+        self.total_bytes += size
+
+        evicted = []
+        # حذف الأقل استخداماً أولاً، مع إبقاء الملف الجديد دائماً
+        while self.total_bytes > self.max_bytes and len(self._index) > 1:
+            oldest_key = next(iter(self._index))
+            evicted.append(self._remove_entry(oldest_key).path)
+            self.evictions += 1
+        return evicted
+
+    @staticmethod
+    def _delete_files(paths):
+        for path in paths:
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.error(f"Error deleting cached file {path}: {e}")
+
+    async def get_cached_image(self, url: str) -> str:
+        """
+        الحصول على الصورة من التخزين المؤقت أو تحميلها.
+        يرجع None إذا فشل الرابط مؤخراً (negative_cache) أو أرجع خطأ HTTP، فيُرسل الخبر بدون صورة
+        بدل أن يحاول التليجرام تحميل رابط معطل
+        """
         if not self.cache_enabled or not url:
             return url
-        
+
         try:
+            await self._ensure_index()
             cache_key = self._get_cache_key(url)
-            
-            # البحث عن الملف في التخزين المؤقت
-            for ext in ['.jpg', '.jpeg', '.png', '.gif', '.webp']:
-                cache_path = self._get_cache_path(cache_key, ext)
-                if self._is_cache_valid(cache_path):
+
+            # البحث في الفهرس (بدون أي عملية على القرص)
+            entry = self._index.get(cache_key)
+            if entry is not None:
+                now = time.time()
+                if not self._is_expired(entry, now):
+                    entry.last_access = now
+                    self._index.move_to_end(cache_key)
+                    self.hits += 1
                     logger.info(f"Cache hit for image: {url}")
-                    return str(cache_path.absolute())
-            
-            # تحميل الصورة إذا لم تكن موجودة في التخزين المؤقت
-            return self._download_and_cache_image(url, cache_key)
-            
+                    return str(entry.path.absolute())
+                # ملف منتهي الصلاحية: حذفه وإعادة التحميل
+                await asyncio.to_thread(self._delete_files, [self._remove_entry(cache_key).path])
+
+            # تحميل الصورة إذا لم تكن موجودة في التخزين المؤقت،
+            # والطلبات المتزامنة لنفس الرابط تنتظر نفس التحميل
+            download = self._downloads.get(cache_key)
+            if download is None:
+                self.misses += 1
+                download = asyncio.ensure_future(self._download_and_cache_image(url, cache_key))
+                self._downloads[cache_key] = download
+                download.add_done_callback(lambda _: self._downloads.pop(cache_key, None))
+            else:
+                self.shared_downloads += 1
+            # shield: إلغاء أحد المنتظرين لا يلغي التحميل المشترك
+            return await asyncio.shield(download)
+
         except Exception as e:
             logger.error(f"Error in cache manager for {url}: {e}")
             return url
-    
-    def _download_and_cache_image(self, url: str, cache_key: str) -> str:
-        """تحميل الصورة وحفظها في التخزين المؤقت"""
+
+    @staticmethod
+    def _get_extension(content_type: str, url: str) -> str:
+        """تحديد امتداد الملف من نوع المحتوى"""
+        content_type = content_type.lower()
+        if 'jpeg' in content_type or 'jpg' in content_type:
+            return '.jpg'
+        if 'png' in content_type:
+            return '.png'
+        if 'gif' in content_type:
+            return '.gif'
+        if 'webp' in content_type:
+            return '.webp'
+        # محاولة استخراج الامتداد من الرابط
+        extension = Path(url).suffix.lower()
+        if extension not in IMAGE_EXTENSIONS:
+            extension = '.jpg'  # افتراضي
+        return extension
+
+    async def _write_stream(self, response, temp_path: Path):
+        """كتابة المحتوى تدريجياً في الملف المؤقت وإرجاع حجمه، أو None إذا تجاوز الحجم الأقصى"""
+        size = 0
+        file = await asyncio.to_thread(open, temp_path, 'wb')
         try:
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-            }
-            
-            response = requests.get(url, headers=headers, timeout=REQUEST_TIMEOUT, stream=True)
-            response.raise_for_status()
-            
-            # تحديد امتداد الملف من نوع المحتوى
-            content_type = response.headers.get('content-type', '').lower()
-            if 'jpeg' in content_type or 'jpg' in content_type:
-                extension = '.jpg'
-            elif 'png' in content_type:
-                extension = '.png'
-            elif 'gif' in content_type:
-                extension = '.gif'
-            elif 'webp' in content_type:
-                extension = '.webp'
-            else:
-                # محاولة استخراج الامتداد من الرابط
-                extension = Path(url).suffix.lower()
-                if extension not in ['.jpg', '.jpeg', '.png', '.gif', '.webp']:
-                    extension = '.jpg'  # افتراضي
-            
+            async for chunk in response.content.iter_chunked(STREAM_CHUNK_SIZE):
+                size += len(chunk)
+                if size > self.max_image_bytes:
+                    return None
+                await asyncio.to_thread(file.write, chunk)
+        finally:
+            await asyncio.to_thread(file.close)
+        return size
+
+    async def _normalize(self, cache_key: str, temp_path: Path, extension: str, size: int):
+        """
+        تصغير الصورة وإعادة ترميزها مرة واحدة قبل حفظها (في عملية منفصلة)،
+        وإرجاع (الامتداد، المسار المؤقت، الحجم) للنسخة التي ستُحفظ
+        """
+        normalized_path = self._get_cache_path(cache_key, NORMALIZED_TEMP_SUFFIX)
+        result = await cpu_pool.run(
+            image_normalizer.normalize_image,
+            str(temp_path), str(normalized_path), IMAGE_MAX_SIDE, IMAGE_FORMAT, IMAGE_QUALITY
+        )
+        if result is None:
+            return extension, temp_path, size
+
+        normalized_extension, normalized_size = result
+        await asyncio.to_thread(self._delete_files, [temp_path])
+        self.normalized += 1
+        self.bytes_saved += size - normalized_size
+        logger.info(f"Image normalised: {size} -> {normalized_size} bytes")
+        return normalized_extension, normalized_path, normalized_size
+
+    async def _download_and_cache_image(self, url: str, cache_key: str) -> str:
+        """
+        تحميل الصورة تدريجياً إلى ملف مؤقت ثم نقله إلى اسمه النهائي (os.replace)،
+        فلا يُقرأ من التخزين المؤقت ملف ناقص أبداً
+        """
+        temp_path = self._get_cache_path(cache_key, TEMP_SUFFIX)
+        try:
+            async with http_client.stream(url, remember_failures=True) as response:
+                if response.status >= 400:
+                    raise HTTPStatusError(response.status, url)
+                if response.content_length and response.content_length > self.max_image_bytes:
+                    logger.warning(f"Image larger than the per-image limit, not cached: {url} ({response.content_length} bytes)")
+                    return url
+                extension = self._get_extension(response.headers.get('content-type', ''), url)
+                size = await self._write_stream(response, temp_path)
+
+            if size is None:
+                logger.warning(f"Image larger than the per-image limit, not cached: {url}")
+                await asyncio.to_thread(temp_path.unlink, missing_ok=True)
+                return url
+
+            if self.normalize_images:
+                extension, temp_path, size = await self._normalize(cache_key, temp_path, extension, size)
+
             cache_path = self._get_cache_path(cache_key, extension)
-            
-            # حفظ الصورة
-            with open(cache_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
-            
+            await asyncio.to_thread(os.replace, temp_path, cache_path)
+            evicted = self._add_entry(cache_key, cache_path, size)
+            if evicted:
+                await asyncio.to_thread(self._delete_files, evicted)
+                logger.info(f"Evicted {len(evicted)} least recently used cached files")
+
             logger.info(f"Image cached: {url} -> {cache_path}")
             return str(cache_path.absolute())
-            
+
+        except KnownBadURLError as e:
+            logger.info(str(e))
+            return None
+        except HTTPStatusError as e:
+            # الرابط لا يعمل (ويُسجل في negative_cache)، فلا فائدة من تمريره إلى التليجرام
+            logger.warning(f"Image not available, sending without it: {e}")
+            await asyncio.to_thread(self._delete_files, [temp_path])
+            return None
         except Exception as e:
             logger.error(f"Failed to download and cache image {url}: {e}")
+            await asyncio.to_thread(self._delete_files, [temp_path, self._get_cache_path(cache_key, NORMALIZED_TEMP_SUFFIX)])
             return url
-    
-    def clear_old_cache(self):
-        """حذف الملفات القديمة من التخزين المؤقت"""
-        if not self.cache_enabled or not self.cache_dir.exists():
+
+    async def clear_old_cache(self):
+        """
+        حذف الملفات القديمة من التخزين المؤقت على دفعات صغيرة:
+        الحذف من القرص في خيط منفصل، مع إفساح المجال لبقية المهام بين الدفعات
+        """
+        if not self.cache_enabled:
             return
-        
+
         try:
-            current_time = time.time()
+            await self._ensure_index()
             deleted_count = 0
-            
-            for file_path in self.cache_dir.iterdir():
-                if file_path.is_file():
-                    file_age = current_time - file_path.stat().st_mtime
-                    if file_age > self.cache_duration:
-                        file_path.unlink()
-                        deleted_count += 1
-            
+            cache_keys = list(self._index)
+            for i in range(0, len(cache_keys), CLEANUP_BATCH_SIZE):
+                current_time = time.time()
+                expired_paths = []
+                for cache_key in cache_keys[i:i + CLEANUP_BATCH_SIZE]:
+                    entry = self._index.get(cache_key)
+                    if entry is not None and self._is_expired(entry, current_time):
+                        expired_paths.append(self._remove_entry(cache_key).path)
+                if expired_paths:
+                    await asyncio.to_thread(self._delete_files, expired_paths)
+                    deleted_count += len(expired_paths)
+                else:
+                    await asyncio.sleep(0)
+
             if deleted_count > 0:
                 logger.info(f"Cleared {deleted_count} old cached files")
-                
+
         except Exception as e:
             logger.error(f"Error clearing old cache: {e}")
-    
+
     def get_cache_stats(self) -> dict:
         """الحصول على إحصائيات التخزين المؤقت"""
-        if not self.cache_enabled or not self.cache_dir.exists():
+        if not self.cache_enabled:
             return {'enabled': False}
-        
+
         try:
-            files = list(self.cache_dir.iterdir())
-            total_files = len([f for f in files if f.is_file()])
-            total_size = sum(f.stat().st_size for f in files if f.is_file())
-            
+            # الفهرس يُبنى عند أول استخدام داخل البوت، لذلك لا يُقرأ القرص هنا
             return {
                 'enabled': True,
-                'total_files': total_files,
-                'total_size_mb': round(total_size / (1024 * 1024), 2),
+                'index_loaded': self._index_loaded,
+                'total_files': len(self._index),
+                'total_size_mb': round(self.total_bytes / (1024 * 1024), 2),
+                'max_size_mb': round(self.max_bytes / (1024 * 1024), 2),
+                'max_image_size_mb': round(self.max_image_bytes / (1024 * 1024), 2),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'shared_downloads': self.shared_downloads,
+                'normalize_images': self.normalize_images,
+                'normalized': self.normalized,
+                'bytes_saved_mb': round(self.bytes_saved / (1024 * 1024), 2),
+                'downloads_in_progress': len(self._downloads),
                 'cache_dir': str(self.cache_dir),
                 'cache_duration_hours': self.cache_duration / 3600
             }
@@ -145,4 +336,4 @@ class CacheManager:
             return {'enabled': True, 'error': str(e)}
 
 # إنشاء مثيل عام لمدير التخزين المؤقت
-cache_manager = CacheManager()
\ No newline at end of file
+cache_manager = CacheManager()
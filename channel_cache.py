@@ -0,0 +1,63 @@
+# channel_cache.py
+
+import asyncio
+import logging
+from database import get_setting, save_setting
+from db_writer import db_writer
+
+logger = logging.getLogger(__name__)
+
+class ChannelIdCache:
+    """
+    تخزين المعرف الرقمي للقناة في الذاكرة وفي قاعدة البيانات،
+    فلا يُستدعى bot.get_chat إلا مرة واحدة (أو عند نقل المحادثة)
+    """
+    def __init__(self):
+        self._chat_ids = {}
+
+    @staticmethod
+    def _setting_key(channel_username):
+        return f"chat_id:{channel_username}"
+
+    async def resolve(self, bot, channel_username):
+        """إرجاع المعرف الرقمي للقناة من الذاكرة، ثم قاعدة البيانات، ثم واجهة التليجرام"""
+        chat_id = self._chat_ids.get(channel_username)
+        if chat_id:
+            return chat_id
+
+        # قاعدة البيانات تحفظ أيضاً المعرف الجديد بعد نقل محادثة معرفها رقمي
+        chat_id = await asyncio.to_thread(get_setting, self._setting_key(channel_username))
+        if chat_id:
+            self._chat_ids[channel_username] = chat_id
+            logger.info(f"تم تحميل معرف القناة {channel_username} من قاعدة البيانات: {chat_id}")
+            return chat_id
+
+        # المعرف الرقمي أو غير المبدوء بـ @ يُستخدم كما هو
+        if not channel_username.startswith('@'):
+            self._chat_ids[channel_username] = channel_username
+            return channel_username
+
+        try:
+            chat = await bot.get_chat(channel_username)
+        except Exception as chat_error:
+            logger.warning(f"فشل في تحويل معرف القناة {channel_username}: {chat_error}")
+            # إذا فشل التحويل، نستخدم المعرف كما هو دون تخزينه
+            return channel_username
+
+        logger.info(f"تم تحويل معرف القناة {channel_username} إلى {chat.id}")
+        await self.store(channel_username, chat.id)
+        return str(chat.id)
+
+    async def store(self, channel_username, chat_id):
+        """حفظ المعرف في الذاكرة وقاعدة البيانات"""
+        chat_id = str(chat_id)
+        self._chat_ids[channel_username] = chat_id
+        await db_writer.submit(save_setting, self._setting_key(channel_username), chat_id)
+
+    async def migrate(self, channel_username, new_chat_id):
+        """تحديث المعرف عندما يخبرنا التليجرام بنقل المحادثة (ChatMigrated)"""
+        logger.warning(f"تم نقل المحادثة {channel_username} إلى {new_chat_id}")
+        await self.store(channel_username, new_chat_id)
+
+# إنشاء مثيل عام لتخزين معرف القناة
+channel_id_cache = ChannelIdCache()
@@ -4,9 +4,15 @@
 سكريبت فحص قاعدة البيانات ومعرفة حالة المقالات
 """
 
+import sys
 import datetime
-from database import get_db_session, Article
-from sqlalchemy import func
+from database import get_db_session, Article, engine
+from sqlalchemy import func, select, false
+
+# استعلامات يُقبل فيها المرور على فهرس كامل (SCAN ... USING INDEX) دون مسح الجدول نفسه:
+# top_sources يجمع كل المقالات بطبيعته فيكفيه فهرس المصدر، و latest_articles يقرأ
+# فهرس تاريخ النشر بالترتيب ويتوقف بعد LIMIT
+INDEX_SCAN_QUERIES = {'top_sources', 'latest_articles'}
 
 def check_database():
     """فحص قاعدة البيانات"""
@@ -78,5 +84,111 @@ def check_database():
     print("\n" + "=" * 50)
     print("🔚 انتهاء فحص قاعدة البيانات")
 
+def get_hot_queries():
+    """الاستعلامات الأكثر استخداماً على جدول المقالات (كما في البوت والسكريبتات)"""
+    now = datetime.datetime.utcnow()
+    last_day = now - datetime.timedelta(hours=24)
+    last_week = now - datetime.timedelta(days=7)
+    fallback_any = (
+        Article.sent_to_telegram == false(),
+        Article.sentiment_score > 0.3,
+        Article.published_date >= last_day,
+        Article.published_date <= now
+    )
+    fallback_algerian = (*fallback_any, Article.source.like('%الجزائر%'))
+
+    return {
+        # get_random_unsent_high_sentiment_article (_pick_random_article)
+        'fallback_algerian_count': select(func.count(Article.id)).where(*fallback_algerian),
+        'fallback_algerian': select(Article).where(*fallback_algerian)
+            .order_by(Article.published_date).offset(1).limit(1),
+        'fallback_any_count': select(func.count(Article.id)).where(*fallback_any),
+        'fallback_any': select(Article).where(*fallback_any)
+            .order_by(Article.published_date).offset(1).limit(1),
+        # send_old_articles
+        'send_old_articles': select(Article).where(
+            Article.sent_to_telegram == false(),
+            Article.published_date >= last_week,
+            Article.sentiment_score > 0.2
+        ).order_by(Article.sentiment_score.desc(), Article.published_date.desc()).limit(5),
+        # check_database
+        'count_sent': select(func.count(Article.id)).where(Article.sent_to_telegram == True),
+        'count_unsent': select(func.count(Article.id)).where(Article.sent_to_telegram == False),
+        'count_recent': select(func.count(Article.id)).where(Article.published_date >= last_day),
+        'count_recent_unsent': select(func.count(Article.id)).where(
+            Article.sent_to_telegram == False,
+            Article.published_date >= last_day
+        ),
+        'top_sources': select(Article.source, func.count(Article.id)).group_by(Article.source)
+            .order_by(func.count(Article.id).desc()).limit(10),
+        'latest_articles': select(Article).order_by(Article.published_date.desc()).limit(5),
+        'positive_unsent': select(Article).where(
+            Article.sent_to_telegram == False,
+            Article.sentiment_score > 0.3
+        ).order_by(Article.published_date.desc()).limit(5),
+        # NotificationManager.get_news_summary
+        'news_summary': select(Article).where(Article.published_date >= last_day)
+            .order_by(Article.published_date.desc()),
+        'news_summary_category': select(Article).where(
+            Article.published_date >= last_day,
+            Article.category == 'sports'
+        ).order_by(Article.published_date.desc()),
+    }
+
+def _explain(connection, statement):
+    """إرجاع خطة التنفيذ كسطور نصية حسب نوع قاعدة البيانات"""
+    compiled = statement.compile(dialect=engine.dialect)
+    if engine.dialect.name == 'sqlite':
+        rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", tuple(compiled.params[name] for name in compiled.positiontup))
+        return [row[-1] for row in rows]
+    rows = connection.exec_driver_sql(f"EXPLAIN {compiled}", compiled.params)
+    return [row[0] for row in rows]
+
+def _is_full_table_scan(line, allow_index_scan=False):
+    """
+    التحقق مما إذا كان سطر الخطة يمثل مسحاً كاملاً لجدول المقالات.
+    في SQLite أي SCAN (حتى USING COVERING INDEX) يقرأ كل الصفوف، بعكس SEARCH؛
+    allow_index_scan يقبل المرور على فهرس كامل لاستعلامات INDEX_SCAN_QUERIES فقط
+    """
+    if engine.dialect.name == 'sqlite':
+        if not line.startswith('SCAN articles'):
+            return False
+        return not (allow_index_scan and ' USING ' in line and 'INDEX' in line)
+    if allow_index_scan and ('Index Scan' in line or 'Index Only Scan' in line):
+        return False
+    return 'Seq Scan on articles' in line
+
+def check_query_plans():
+    """التحقق عبر EXPLAIN من أن الاستعلامات الأكثر استخداماً لا تمسح جدول المقالات بالكامل"""
+    get_db_session().close()  # إنشاء الجداول والفهارس إذا لزم الأمر
+
+    print("🔍 فحص خطط تنفيذ الاستعلامات...")
+    print("=" * 50)
+
+    failures = []
+    with engine.connect() as connection:
+        if engine.dialect.name == 'postgresql':
+            # الجداول الصغيرة تُمسح تسلسلياً دائماً، لذلك نتحقق من توفر مسار عبر الفهارس
+            connection.exec_driver_sql("SET enable_seqscan = off")
+
+        for name, statement in get_hot_queries().items():
+            plan = _explain(connection, statement)
+            allow_index_scan = name in INDEX_SCAN_QUERIES
+            full_scan = any(_is_full_table_scan(line, allow_index_scan) for line in plan)
+            print(f"{'❌' if full_scan else '✅'} {name}")
+            for line in plan:
+                print(f"      {line}")
+            if full_scan:
+                failures.append(name)
+
+    print("\n" + "=" * 50)
+    if failures:
+        print(f"❌ استعلامات تمسح الجدول بالكامل: {', '.join(failures)}")
+    else:
+        print("✅ جميع الاستعلامات تستخدم الفهارس")
+    return not failures
+
 if __name__ == "__main__":
+    if '--explain' in sys.argv:
+        sys.exit(0 if check_query_plans() else 1)
     check_database() 
\ No newline at end of file
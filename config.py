@@ -22,15 +22,58 @@ if not TELEGRAM_BOT_TOKEN:
 if not TELEGRAM_CHANNEL_ID:
     raise ValueError("❌ TELEGRAM_CHANNEL_ID غير موجود في متغيرات البيئة")
 
+# ==================== إعدادات معدل الإرسال ====================
+TELEGRAM_GLOBAL_RATE = float(os.getenv('TELEGRAM_GLOBAL_RATE', '30'))  # الحد العام للبوت (رسالة/ثانية)
+CHANNEL_MIN_INTERVAL = float(os.getenv('CHANNEL_MIN_INTERVAL', '3'))  # أقل فاصل بين رسالتين في القناة (بالثواني)
+PRIVATE_CHAT_RATE = float(os.getenv('PRIVATE_CHAT_RATE', '1'))  # الحد لكل محادثة خاصة (رسالة/ثانية)
+
 # ==================== إعدادات قاعدة البيانات ====================
 DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///news.db')
+SEEN_LINKS_CACHE_SIZE = int(os.getenv('SEEN_LINKS_CACHE_SIZE', '20000'))  # عدد الروابط المعروفة في الذاكرة
+SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', str(128 * 1024 * 1024)))  # قراءة عبر الذاكرة المعينة (128 ميغابايت)
+DB_WRITER_BATCH_SIZE = int(os.getenv('DB_WRITER_BATCH_SIZE', '100'))  # الحد الأقصى للعمليات في كل commit
+
+# ==================== إعدادات النشر ====================
+OUTBOX_POLL_INTERVAL = int(os.getenv('OUTBOX_POLL_INTERVAL', '30'))  # فحص صندوق الإرسال عند عدم وجود تنبيه (بالثواني)
+OUTBOX_RETRY_DELAY = int(os.getenv('OUTBOX_RETRY_DELAY', '60'))  # التأخير الأول بعد فشل النشر (بالثواني)
+OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', '5'))  # عدد المحاولات قبل إسقاط المقال
+
+# ==================== إعدادات المعالجة ====================
+# المعالجات المتاحة فعلاً للعملية (قد تكون أقل من معالجات الخادم داخل الحاويات)
+_AVAILABLE_CPUS = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else (os.cpu_count() or 1)
+# كل عملية تستهلك حوالي 56MB، لذلك القيمة الافتراضية صغيرة
+CPU_WORKERS = int(os.getenv('CPU_WORKERS', str(min(2, _AVAILABLE_CPUS))))  # عدد عمليات التحليل (0 = خيط داخل نفس العملية)
+CPU_QUEUE_SIZE = int(os.getenv('CPU_QUEUE_SIZE', str(max(CPU_WORKERS, 1) * 4)))  # الحد الأقصى للمهام المنتظرة أو الجارية
 
 # ==================== إعدادات التخزين المؤقت ====================
 CACHE_ENABLED = os.getenv('CACHE_ENABLED', 'true').lower() == 'true'
 CACHE_DURATION = int(os.getenv('CACHE_DURATION', '3600'))  # ساعة واحدة
 CACHE_DIR = os.getenv('CACHE_DIR', 'cache')
+CACHE_MAX_BYTES = int(os.getenv('CACHE_MAX_BYTES', str(100 * 1024 * 1024)))  # الحجم الأقصى لمجلد التخزين المؤقت (تُحذف الصور الأقل استخداماً)
+IMAGE_MAX_BYTES = int(os.getenv('IMAGE_MAX_BYTES', str(10 * 1024 * 1024)))  # الحجم الأقصى لصورة واحدة في التخزين المؤقت (حد رفع الصور في التليجرام)
+IMAGE_NORMALIZE = os.getenv('IMAGE_NORMALIZE', 'true').lower() == 'true'  # تصغير وإعادة ترميز الصور قبل حفظها
+IMAGE_MAX_SIDE = int(os.getenv('IMAGE_MAX_SIDE', '1280'))  # أكبر بعد للصورة (مقاس العرض في التليجرام)
+IMAGE_FORMAT = os.getenv('IMAGE_FORMAT', 'jpeg').lower()  # jpeg أو webp
+IMAGE_QUALITY = int(os.getenv('IMAGE_QUALITY', '85'))  # جودة الترميز (1-95)
 
 # ==================== إعدادات الشبكة ====================
 REQUEST_TIMEOUT = int(os.getenv('REQUEST_TIMEOUT', '30'))  # 30 ثانية
 MAX_RETRIES = int(os.getenv('MAX_RETRIES', '3'))  # 3 محاولات
-RETRY_DELAY = int(os.getenv('RETRY_DELAY', '5'))  # 5 ثوان
\ No newline at end of file
+RETRY_DELAY = int(os.getenv('RETRY_DELAY', '5'))  # 5 ثوان
+
+# ==================== إعدادات الجلب المتزامن ====================
+HTTP_MAX_CONCURRENCY = int(os.getenv('HTTP_MAX_CONCURRENCY', '32'))  # الحد الأقصى للطلبات المتزامنة
+HTTP_MAX_PER_HOST = int(os.getenv('HTTP_MAX_PER_HOST', '4'))  # الحد الأقصى للطلبات لكل خادم
+FETCH_OVERLAP_POLICY = os.getenv('FETCH_OVERLAP_POLICY', 'coalesce')  # عند تداخل دورات الجلب: coalesce أو skip
+HTML_PARSER = os.getenv('HTML_PARSER', 'auto')  # محلل HTML: auto (lxml إن وجد) أو lxml أو html.parser
+ARTICLE_MAX_BYTES = int(os.getenv('ARTICLE_MAX_BYTES', str(2 * 1024 * 1024)))  # الحد الأقصى لحجم صفحة المقال المقروء
+ARTICLE_FETCH_DEADLINE = int(os.getenv('ARTICLE_FETCH_DEADLINE', '10'))  # المهلة الكلية لتحميل صفحة المقال (بالثواني)
+NEGATIVE_CACHE_TTL = int(os.getenv('NEGATIVE_CACHE_TTL', '3600'))  # مدة تجاوز رابط أرجع 404 أو 410 (بالثواني)
+NEGATIVE_CACHE_TRANSIENT_TTL = int(os.getenv('NEGATIVE_CACHE_TRANSIENT_TTL', '300'))  # مدة تجاوز رابط بعد انتهاء المهلة أو خطأ 5xx أو الحظر
+NEGATIVE_CACHE_SIZE = int(os.getenv('NEGATIVE_CACHE_SIZE', '5000'))  # عدد الروابط الفاشلة المحفوظة في الذاكرة
+NEGATIVE_HOST_THRESHOLD = int(os.getenv('NEGATIVE_HOST_THRESHOLD', '3'))  # عدد الأخطاء المتتالية قبل تجاوز الخادم كله
+NEGATIVE_HOST_TTL = int(os.getenv('NEGATIVE_HOST_TTL', '600'))  # مدة تجاوز الخادم (بالثواني)
+HTTP_USER_AGENT = os.getenv(
+    'HTTP_USER_AGENT',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+)
@@ -0,0 +1,72 @@
+# cpu_pool.py
+
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from config import CPU_WORKERS, CPU_QUEUE_SIZE
+
+logger = logging.getLogger(__name__)
+
+class CpuPool:
+    """
+    مرحلة المعالجة الثقيلة (تحليل الخلاصات وصفحات HTML، تنظيف النصوص وتحليل المشاعر)
+    في مجموعة عمليات منفصلة حتى لا تنحصر في خيط event loop الوحيد.
+    عدد المهام المرسلة في نفس الوقت محدود (طابور محدود بين الشبكة والمعالج)
+    """
+    def __init__(self, workers: int = CPU_WORKERS, queue_size: int = CPU_QUEUE_SIZE):
+        self.workers = workers
+        self.queue_size = queue_size
+        self._executor = None
+        self._slots = None
+        self._loop = None
+        self.tasks_completed = 0
+
+    def _get_slots(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._slots is None or self._loop is not loop:
+            self._slots = asyncio.Semaphore(self.queue_size)
+            self._loop = loop
+        return self._slots
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: العمليات لا ترث خيوط البوت ولا اتصالاته المفتوحة
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+            logger.info(f"CPU pool started with {self.workers} worker processes")
+        return self._executor
+
+    async def run(self, func, *args):
+        """
+        تنفيذ func(*args) في عملية منفصلة وإرجاع النتيجة.
+        func ومعاملاتها ونتيجتها يجب أن تكون قابلة للنقل بين العمليات (pickle).
+        عند CPU_WORKERS=0 تُنفذ في خيط منفصل داخل نفس العملية.
+        """
+        async with self._get_slots():
+            if self.workers <= 0:
+                result = await asyncio.to_thread(func, *args)
+            else:
+                loop = asyncio.get_running_loop()
+                try:
+                    result = await loop.run_in_executor(self._get_executor(), func, *args)
+                except BrokenProcessPool:
+                    # توقفت إحدى العمليات بشكل مفاجئ: إنشاء مجموعة جديدة للطلبات التالية
+                    logger.error("CPU pool worker died, restarting the pool")
+                    self._executor = None
+                    raise
+            self.tasks_completed += 1
+            return result
+
+    def shutdown(self):
+        """إيقاف العمليات عند إيقاف البوت"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            logger.info("CPU pool stopped")
+
+# إنشاء مثيل عام لمجموعة عمليات المعالجة
+cpu_pool = CpuPool()
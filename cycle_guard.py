@@ -0,0 +1,91 @@
+# cycle_guard.py
+
+import time
+import logging
+from config import FETCH_OVERLAP_POLICY
+
+logger = logging.getLogger(__name__)
+
+# حدود فئات مدة الدورة (بالثواني) في المدرج التكراري
+DURATION_BUCKETS = (1, 2, 5, 10, 30, 60, 120, 300, 600)
+
+class SingleFlight:
+    """
+    منع تداخل دورات مهمة دورية: التشغيل الذي يصل أثناء دورة جارية إما يُتجاهل (skip)
+    أو يُدمج في دورة واحدة تبدأ مباشرة بعد انتهاء الجارية (coalesce)
+    """
+    def __init__(self, name: str, policy: str = FETCH_OVERLAP_POLICY):
+        self.name = name
+        self.coalesce = policy == 'coalesce'
+        self.in_flight = False
+        self.pending = False
+        self.runs = 0
+        self.failures = 0
+        self.skipped_triggers = 0
+        self.coalesced_triggers = 0
+        self.last_duration = None
+        self.max_duration = 0.0
+        self.total_duration = 0.0
+        self.duration_buckets = [0] * (len(DURATION_BUCKETS) + 1)  # الفئة الأخيرة: أكثر من الحد الأعلى
+
+    def _record_duration(self, duration: float):
+        self.runs += 1
+        self.last_duration = duration
+        self.max_duration = max(self.max_duration, duration)
+        self.total_duration += duration
+        for i, bound in enumerate(DURATION_BUCKETS):
+            if duration <= bound:
+                self.duration_buckets[i] += 1
+                break
+        else:
+            self.duration_buckets[-1] += 1
+
+    async def run(self, func, *args, **kwargs):
+        """تشغيل func إذا لم تكن هناك دورة جارية، وإلا تسجيل التشغيل كمتجاهل أو مدمج"""
+        if self.in_flight:
+            if self.coalesce:
+                self.pending = True
+                self.coalesced_triggers += 1
+                logger.info(f"{self.name}: دورة سابقة ما زالت جارية، سيتم تشغيل دورة واحدة بعد انتهائها")
+            else:
+                self.skipped_triggers += 1
+                logger.info(f"{self.name}: دورة سابقة ما زالت جارية، تم تجاهل هذا التشغيل")
+            return
+
+        self.in_flight = True
+        try:
+            while True:
+                self.pending = False
+                started = time.monotonic()
+                try:
+                    await func(*args, **kwargs)
+                except Exception:
+                    self.failures += 1
+                    raise
+                finally:
+                    self._record_duration(time.monotonic() - started)
+                if not self.pending:
+                    break
+        finally:
+            self.in_flight = False
+            self.pending = False
+
+    def get_stats(self) -> dict:
+        """إحصائيات الدورات لتحديد فترة الجدولة المناسبة"""
+        labels = [f"<={bound}s" for bound in DURATION_BUCKETS] + [f">{DURATION_BUCKETS[-1]}s"]
+        return {
+            'name': self.name,
+            'policy': 'coalesce' if self.coalesce else 'skip',
+            'in_flight': self.in_flight,
+            'runs': self.runs,
+            'failures': self.failures,
+            'skipped_triggers': self.skipped_triggers,
+            'coalesced_triggers': self.coalesced_triggers,
+            'last_duration_seconds': round(self.last_duration, 2) if self.last_duration is not None else None,
+            'mean_duration_seconds': round(self.total_duration / self.runs, 2) if self.runs else None,
+            'max_duration_seconds': round(self.max_duration, 2),
+            'duration_histogram': dict(zip(labels, self.duration_buckets)),
+        }
+
+# إنشاء مثيل عام لحماية دورة جلب الأخبار من التداخل
+fetch_guard = SingleFlight('fetch_news')
@@ -1,14 +1,51 @@
 # ==================== إعدادات قاعدة البيانات ====================
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Boolean, Float, func
+from sqlalchemy import create_engine, event, Column, Integer, String, DateTime, Boolean, Float, BigInteger, Index, ForeignKey, func, false, inspect, text
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.declarative import declarative_base
+from contextlib import contextmanager
 import datetime
 import random
+import threading
+from config import DATABASE_URL, SQLITE_MMAP_SIZE
 
 # ==================== إعدادات الاتصال ====================
-DATABASE_URL = "sqlite:///news.db"
+def _get_engine_url(url):
+    """توحيد رابط قاعدة البيانات (Render يستخدم postgres:// غير المدعوم في SQLAlchemy 2)"""
+    if url.startswith('postgres://'):
+        return url.replace('postgres://', 'postgresql://', 1)
+    return url
+
+def _create_engine(url):
+    """إنشاء محرك واحد مع مجمع اتصالات لكامل العملية"""
+    if url.startswith('sqlite'):
+        # السماح باستخدام الاتصال من خيوط مختلفة (asyncio.to_thread)
+        sqlite_engine = create_engine(url, connect_args={'check_same_thread': False, 'timeout': 30})
+        event.listen(sqlite_engine, 'connect', _set_sqlite_pragmas)
+        return sqlite_engine
+    return create_engine(url, pool_pre_ping=True, pool_size=5, max_overflow=10)
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    WAL: القراءة لا تنتظر الكتابة، و synchronous=NORMAL يكفي مع WAL
+    (لا fsync عند كل commit)، و mmap لتسريع القراءة
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA busy_timeout=30000")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    cursor.close()
+
+engine = _create_engine(_get_engine_url(DATABASE_URL))
+SessionLocal = sessionmaker(bind=engine, expire_on_commit=False)
 Base = declarative_base()
 
+_schema_lock = threading.Lock()
+_schema_ready = False
+
 # ==================== نموذج المقال ====================
 class Article(Base):
     """نموذج قاعدة البيانات للمقالات الإخبارية"""
@@ -25,12 +62,28 @@ class Article(Base):
     # الحقول الإضافية
     category = Column(String, nullable=True)  # تصنيف المقال
     image_url = Column(String, nullable=True)  # رابط الصورة
+    video_url = Column(String, nullable=True)  # رابط الفيديو المستخرج من صفحة المقال
     summary = Column(String, nullable=True)  # ملخص المقال
     
     # حقول التتبع
     sent_to_telegram = Column(Boolean, default=False)  # تم الإرسال للتليجرام
     sentiment_score = Column(Float, nullable=True)  # درجة المشاعر
 
+    # غير محفوظ: تاريخ النشر تقديري (وقت الجلب) لأن الخلاصة والصفحة لم توفرا تاريخاً
+    published_date_estimated = False
+
+    # فهارس الاستعلامات الأكثر استخداماً
+    __table_args__ = (
+        # الأخبار الأخيرة (ملخص الأخبار، آخر المقالات، عدد أخبار آخر 24 ساعة)
+        Index('ix_articles_published_date', 'published_date'),
+        # عدد المرسل/غير المرسل وغير المرسل خلال فترة (المقال الاحتياطي و send_old_articles)
+        Index('ix_articles_sent_published', 'sent_to_telegram', 'published_date'),
+        # إحصائيات المصادر (التجميع حسب المصدر يقرأ هذا الفهرس فقط بدل الجدول)
+        Index('ix_articles_source', 'source'),
+        # ملخص الأخبار حسب الفئة
+        Index('ix_articles_category_published', 'category', 'published_date'),
+    )
+
     def __repr__(self):
         return f"<Article(title='{self.title}', source='{self.source}')>"
 
@@ -54,46 +107,340 @@ class Subscriber(Base):
     user_id = Column(Integer, unique=True, nullable=False)
     subscribed_at = Column(DateTime, default=datetime.datetime.utcnow)
 
+# ==================== نموذج حالة الخلاصات ====================
+class FeedState(Base):
+    """نموذج قاعدة البيانات لحفظ بيانات التحقق (ETag و Last-Modified) لكل خلاصة RSS"""
+    __tablename__ = 'feed_states'
+
+    id = Column(Integer, primary_key=True)
+    url = Column(String, unique=True, nullable=False)
+    etag = Column(String, nullable=True)
+    last_modified = Column(String, nullable=True)
+    content_hash = Column(String, nullable=True)  # بصمة آخر محتوى تم تحليله
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+
+# ==================== نموذج الإعدادات ====================
+class Setting(Base):
+    """نموذج قاعدة البيانات لقيم مفتاح/قيمة دائمة (مثل المعرف الرقمي للقناة)"""
+    __tablename__ = 'settings'
+
+    id = Column(Integer, primary_key=True)
+    key = Column(String, unique=True, nullable=False)
+    value = Column(String, nullable=True)
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+
+# ==================== نموذج ملفات التليجرام ====================
+class TelegramFile(Base):
+    """نموذج قاعدة البيانات لمعرف الملف (file_id) الذي يرجعه التليجرام بعد أول رفع، مفهرس ببصمة محتوى الملف"""
+    __tablename__ = 'telegram_files'
+
+    id = Column(Integer, primary_key=True)
+    content_hash = Column(String, unique=True, nullable=False)  # sha256 لمحتوى الملف
+    file_id = Column(String, nullable=False)
+    file_unique_id = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+# ==================== نموذج صندوق الإرسال ====================
+class OutboxItem(Base):
+    """
+    نموذج قاعدة البيانات لصندوق الإرسال (outbox): المقالات التي تنتظر النشر في القناة.
+    يكتب فيه الجلب ويقرأ منه الناشر، فتبقى العناصر المعلقة بعد إعادة التشغيل
+    """
+    __tablename__ = 'outbox'
+
+    id = Column(Integer, primary_key=True)  # ترتيب الإضافة داخل نفس الأولوية
+    article_id = Column(Integer, ForeignKey('articles.id'), unique=True, nullable=False)
+    priority = Column(BigInteger, nullable=False, default=0)  # مفتاح الترتيب من ArticlePriorityQueue، الأصغر يُنشر أولاً
+    enqueued_at = Column(DateTime, default=datetime.datetime.utcnow, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)  # عدد محاولات النشر الفاشلة
+    next_attempt_at = Column(DateTime, default=datetime.datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        # اختيار العنصر التالي حسب مفتاح الترتيب ثم ترتيب الإضافة (O(log n) عبر الفهرس)
+        Index('ix_outbox_priority_id', 'priority', 'id'),
+    )
+
 # ==================== دوال قاعدة البيانات ====================
 
+def upgrade_schema():
+    """
+    ترقية قاعدة بيانات موجودة: إضافة الأعمدة والفهارس الناقصة
+    (create_all لا يعدل الجداول الموجودة مسبقاً)
+    """
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing_columns:
+                continue
+            # الأعمدة الجديدة اختيارية (nullable) فتكفي ALTER TABLE ADD COLUMN
+            column_type = column.type.compile(dialect=engine.dialect)
+            with engine.begin() as connection:
+                connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+def init_db():
+    """إنشاء الجداول مرة واحدة فقط عند بدء التشغيل"""
+    global _schema_ready
+    if _schema_ready:
+        return
+    with _schema_lock:
+        if not _schema_ready:
+            Base.metadata.create_all(engine)
+            upgrade_schema()
+            _schema_ready = True
+
 def get_db_session():
     """إنشاء جلسة اتصال جديدة مع قاعدة البيانات"""
-    engine = create_engine(DATABASE_URL)
-    Base.metadata.create_all(engine)
-    Session = sessionmaker(bind=engine)
-    return Session()
+    init_db()
+    return SessionLocal()
+
+@contextmanager
+def session_scope():
+    """جلسة قصيرة العمر مع حفظ التغييرات تلقائياً أو التراجع عند الخطأ"""
+    session = get_db_session()
+    try:
+        yield session
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+def get_existing_links(session, links, chunk_size=500):
+    """إرجاع مجموعة الروابط الموجودة مسبقاً في قاعدة البيانات باستعلام واحد لكل دفعة"""
+    existing = set()
+    links = list(links)
+    for i in range(0, len(links), chunk_size):
+        chunk = links[i:i + chunk_size]
+        rows = session.query(Article.link).filter(Article.link.in_(chunk)).all()
+        existing.update(row[0] for row in rows)
+    return existing
+
+def get_recent_links(limit):
+    """إرجاع روابط أحدث المقالات المحفوظة (لتهيئة فهرس الروابط المعروفة)"""
+    with session_scope() as session:
+        rows = session.query(Article.link).order_by(Article.id.desc()).limit(limit).all()
+        return [row[0] for row in rows]
 
-def get_random_unsent_high_sentiment_article():
+def load_feed_states():
+    """تحميل بيانات التحقق لجميع الخلاصات في قاموس مفهرس بالرابط"""
+    with session_scope() as session:
+        return {
+            state.url: {
+                'etag': state.etag,
+                'last_modified': state.last_modified,
+                'content_hash': state.content_hash
+            }
+            for state in session.query(FeedState).all()
+        }
+
+def get_setting(key):
+    """قراءة قيمة محفوظة أو None"""
+    with session_scope() as session:
+        row = session.query(Setting.value).filter_by(key=key).first()
+        return row[0] if row else None
+
+def get_telegram_file_id(content_hash):
+    """قراءة file_id المحفوظ لبصمة محتوى أو None"""
+    with session_scope() as session:
+        row = session.query(TelegramFile.file_id).filter_by(content_hash=content_hash).first()
+        return row[0] if row else None
+
+# ==================== عمليات الكتابة (تُنفذ عبر db_writer) ====================
+# كل عملية تستقبل الجلسة كأول معامل ولا تقوم بـ commit بنفسها
+
+def save_feed_state(session, url, etag=None, last_modified=None, content_hash=None):
+    """حفظ أو تحديث بيانات التحقق لخلاصة واحدة"""
+    state = session.query(FeedState).filter_by(url=url).first()
+    if not state:
+        state = FeedState(url=url)
+        session.add(state)
+    state.etag = etag
+    state.last_modified = last_modified
+    state.content_hash = content_hash
+
+def save_setting(session, key, value):
+    """حفظ أو تحديث قيمة مفتاح/قيمة"""
+    setting = session.query(Setting).filter_by(key=key).first()
+    if not setting:
+        setting = Setting(key=key)
+        session.add(setting)
+    setting.value = value
+
+def save_telegram_file_id(session, content_hash, file_id, file_unique_id=None):
+    """حفظ أو تحديث file_id لبصمة محتوى"""
+    telegram_file = session.query(TelegramFile).filter_by(content_hash=content_hash).first()
+    if not telegram_file:
+        telegram_file = TelegramFile(content_hash=content_hash)
+        session.add(telegram_file)
+    telegram_file.file_id = file_id
+    telegram_file.file_unique_id = file_unique_id
+
+def delete_telegram_file_id(session, content_hash):
+    """حذف file_id لم يعد التليجرام يقبله"""
+    session.query(TelegramFile).filter_by(content_hash=content_hash).delete()
+
+ARTICLE_INSERT_FIELDS = (
+    'title', 'link', 'source', 'published_date', 'category',
+    'image_url', 'video_url', 'summary', 'sentiment_score'
+)
+
+def insert_articles(session, articles, chunk_size=500):
+    """
+    إضافة دفعة مقالات بعبارة INSERT واحدة لكل 500 مقال مع تجاهل الروابط الموجودة
+    (ON CONFLICT DO NOTHING) وإرجاع المقالات المضافة فعلاً مع معرفاتها (RETURNING)
+    """
+    if not articles:
+        return []
+
+    dialect_insert = postgresql_insert if session.bind.dialect.name == 'postgresql' else sqlite_insert
+    now = datetime.datetime.utcnow()
+    inserted_ids = {}
+
+    for i in range(0, len(articles), chunk_size):
+        rows = []
+        for article in articles[i:i + chunk_size]:
+            row = {field: getattr(article, field) for field in ARTICLE_INSERT_FIELDS}
+            row['created_at'] = article.created_at or now
+            row['sent_to_telegram'] = bool(article.sent_to_telegram)
+            rows.append(row)
+
+        statement = (
+            dialect_insert(Article)
+            .values(rows)
+            .on_conflict_do_nothing(index_elements=['link'])
+            .returning(Article.id, Article.link)
+        )
+        for article_id, link in session.execute(statement):
+            inserted_ids[link] = article_id
+
+    # المقالات المضافة فقط (المكررة تم تجاهلها)، مع تعيين المعرفات دون استعلام إضافي
+    inserted = []
+    for article in articles:
+        article_id = inserted_ids.pop(article.link, None)
+        if article_id is not None:
+            article.id = article_id
+            inserted.append(article)
+    return inserted
+
+def mark_article_sent(session, article_id):
+    """تحديث حالة المقال إلى مرسل"""
+    session.query(Article).filter_by(id=article_id).update({Article.sent_to_telegram: True})
+
+def enqueue_articles(session, entries):
+    """
+    إضافة مقالات إلى صندوق الإرسال: entries قائمة (article_id, priority) حيث priority مفتاح الترتيب (الأصغر أولاً).
+    المقال الموجود مسبقاً في الصندوق يتم تجاهله (ON CONFLICT DO NOTHING)
+    """
+    if not entries:
+        return 0
+
+    dialect_insert = postgresql_insert if session.bind.dialect.name == 'postgresql' else sqlite_insert
+    now = datetime.datetime.utcnow()
+    rows = [
+        {'article_id': article_id, 'priority': priority, 'enqueued_at': now, 'attempts': 0, 'next_attempt_at': now}
+        for article_id, priority in entries
+    ]
+    statement = dialect_insert(OutboxItem).values(rows).on_conflict_do_nothing(index_elements=['article_id'])
+    return session.execute(statement).rowcount
+
+def complete_outbox_item(session, item_id, article_id):
+    """حذف العنصر من صندوق الإرسال وتحديث حالة المقال إلى مرسل في نفس المعاملة"""
+    session.query(OutboxItem).filter_by(id=item_id).delete()
+    mark_article_sent(session, article_id)
+
+def defer_outbox_item(session, item_id, retry_delay, max_attempts):
+    """تأجيل عنصر فشل نشره، وحذفه بعد تجاوز الحد الأقصى للمحاولات"""
+    item = session.query(OutboxItem).filter_by(id=item_id).first()
+    if not item:
+        return False
+    item.attempts += 1
+    if item.attempts >= max_attempts:
+        session.delete(item)
+        return False
+    # تأخير متزايد مع كل محاولة فاشلة
+    item.next_attempt_at = datetime.datetime.utcnow() + datetime.timedelta(seconds=retry_delay * 2 ** (item.attempts - 1))
+    return True
+
+# ==================== قراءة صندوق الإرسال ====================
+
+def get_next_outbox_item():
+    """إرجاع (العنصر، المقال) التالي الجاهز للنشر أو None"""
+    with session_scope() as session:
+        row = (
+            session.query(OutboxItem, Article)
+            .join(Article, Article.id == OutboxItem.article_id)
+            .filter(OutboxItem.next_attempt_at <= datetime.datetime.utcnow())
+            .order_by(OutboxItem.priority, OutboxItem.id)
+            .first()
+        )
+        return tuple(row) if row else None
+
+def get_outbox_stats():
+    """عمق صندوق الإرسال وعمر أقدم عنصر فيه (بالثواني)"""
+    with session_scope() as session:
+        depth, oldest = session.query(func.count(OutboxItem.id), func.min(OutboxItem.enqueued_at)).one()
+    return {
+        'depth': depth,
+        'oldest_enqueued_at': oldest.isoformat() if oldest else None,
+        'oldest_age_seconds': round((datetime.datetime.utcnow() - oldest).total_seconds()) if oldest else 0
+    }
+
+def _pick_random_article(session, since, until, *filters):
+    """
+    اختيار مقال عشوائي بتوزيع منتظم دون ترتيب جميع الصفوف (بديل ORDER BY random()):
+    نعد المقالات المطابقة في النطاق عبر فهرس تاريخ النشر ثم نأخذ واحداً بإزاحة عشوائية
+    """
+    conditions = (*filters, Article.published_date >= since, Article.published_date <= until)
+    count = session.query(func.count(Article.id)).filter(*conditions).scalar()
+    if not count:
+        return None
+    return (
+        session.query(Article).filter(*conditions)
+        .order_by(Article.published_date)
+        .offset(random.randrange(count))
+        .first()
+    )
+
+def get_random_unsent_high_sentiment_article(session=None):
     """
     استرجاع مقال عشوائي غير مرسل بمشاعر إيجابية من آخر 24 ساعة
     مع إعطاء أولوية للمصادر الجزائرية
+    عند تمرير جلسة، يبقى المقال مرتبطاً بها لتحديث حالته لاحقاً
     """
-    session = get_db_session()
+    owns_session = session is None
+    if owns_session:
+        session = get_db_session()
     try:
         # حساب الوقت قبل 24 ساعة
-        twenty_four_hours_ago = datetime.datetime.utcnow() - datetime.timedelta(hours=24)
+        now = datetime.datetime.utcnow()
+        twenty_four_hours_ago = now - datetime.timedelta(hours=24)
         
         # البحث عن مقال جزائري أولاً
-        algerian_article = session.query(Article).filter(
-            Article.sent_to_telegram == False,
+        algerian_article = _pick_random_article(
+            session, twenty_four_hours_ago, now,
+            Article.sent_to_telegram == false(),
             Article.sentiment_score > 0.3,  # مشاعر إيجابية
-            Article.published_date >= twenty_four_hours_ago,
             Article.source.like('%الجزائر%')  # مصادر جزائرية
-        ).order_by(func.random()).first()
+        )
         
         if algerian_article:
             return algerian_article
         
         # إذا لم توجد مقالات جزائرية، البحث في المصادر العربية
-        article = session.query(Article).filter(
-            Article.sent_to_telegram == False,
-            Article.sentiment_score > 0.3,  # مشاعر إيجابية
-            Article.published_date >= twenty_four_hours_ago
-        ).order_by(func.random()).first()
+        article = _pick_random_article(
+            session, twenty_four_hours_ago, now,
+            Article.sent_to_telegram == false(),
+            Article.sentiment_score > 0.3  # مشاعر إيجابية
+        )
         
         return article
     except Exception as e:
         print(f"خطأ في استرجاع المقال: {e}")
         return None
     finally:
-        session.close()
\ No newline at end of file
+        if owns_session:
+            session.close()
\ No newline at end of file
@@ -0,0 +1,121 @@
+# db_writer.py
+
+import asyncio
+import logging
+from config import DB_WRITER_BATCH_SIZE
+from database import get_db_session
+
+logger = logging.getLogger(__name__)
+
+class DatabaseWriter:
+    """
+    كاتب وحيد لقاعدة البيانات: جميع عمليات الكتابة تمر عبر طابور واحد
+    وتُنفذ في خيط منفصل وتُحفظ على دفعات (commit واحد لعدة عمليات)
+    """
+    def __init__(self, max_batch: int = DB_WRITER_BATCH_SIZE):
+        self.max_batch = max_batch
+        self._queue = None
+        self._task = None
+        self.batches_committed = 0
+        self.operations_committed = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """تشغيل مهمة الكتابة على event loop الحالي"""
+        if self.running:
+            return
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+        logger.info("Database writer started")
+
+    async def stop(self):
+        """إنهاء العمليات المعلقة ثم إيقاف مهمة الكتابة"""
+        if not self.running:
+            return
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+        logger.info("Database writer stopped")
+
+    async def submit(self, operation, *args):
+        """
+        إرسال عملية كتابة operation(session, *args) وانتظار نتيجتها.
+        إذا لم تكن مهمة الكتابة تعمل (سكريبتات مستقلة) تُنفذ العملية مباشرة في خيط منفصل.
+        """
+        if not self.running:
+            return await asyncio.to_thread(self._run_single, operation, args)
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((operation, args, future))
+        return await future
+
+    async def _run(self):
+        while True:
+            item = await self._queue.get()
+            if item is None:
+                break
+
+            # تجميع العمليات المنتظرة في دفعة واحدة
+            batch = [item]
+            stop_requested = False
+            while len(batch) < self.max_batch and not self._queue.empty():
+                next_item = self._queue.get_nowait()
+                if next_item is None:
+                    stop_requested = True
+                    break
+                batch.append(next_item)
+
+            results = await asyncio.to_thread(self._commit_batch, batch)
+            for (_, _, future), (ok, value) in zip(batch, results):
+                if future.done():
+                    continue
+                if ok:
+                    future.set_result(value)
+                else:
+                    future.set_exception(value)
+
+            if stop_requested:
+                break
+
+    def _commit_batch(self, batch):
+        """تنفيذ دفعة في معاملة واحدة، مع الرجوع لتنفيذ كل عملية منفردة عند الفشل"""
+        session = get_db_session()
+        try:
+            results = [(True, operation(session, *args)) for operation, args, _ in batch]
+            session.commit()
+            self.batches_committed += 1
+            self.operations_committed += len(batch)
+            return results
+        except Exception as e:
+            session.rollback()
+            if len(batch) == 1:
+                return [(False, e)]
+            logger.warning(f"Database write batch of {len(batch)} failed, retrying one by one: {e}")
+        finally:
+            session.close()
+
+        results = []
+        for operation, args, _ in batch:
+            try:
+                results.append((True, self._run_single(operation, args)))
+            except Exception as e:
+                results.append((False, e))
+        return results
+
+    def _run_single(self, operation, args):
+        session = get_db_session()
+        try:
+            result = operation(session, *args)
+            session.commit()
+            return result
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+# إنشاء مثيل عام لكاتب قاعدة البيانات
+db_writer = DatabaseWriter()
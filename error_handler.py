@@ -1,10 +1,13 @@
 # error_handler.py
 
 import time
+import random
+import asyncio
 import logging
 import requests
 from functools import wraps
-from typing import Callable, Any, Optional
+from typing import Callable, Any, Optional, Tuple
+from telegram import error as telegram_error
 from config import MAX_RETRIES, RETRY_DELAY, REQUEST_TIMEOUT
 
 logger = logging.getLogger(__name__)
@@ -17,8 +20,74 @@ class RateLimitError(Exception):
     """استثناء مخصص لتجاوز حد الطلبات"""
     pass
 
-def retry_on_failure(max_retries: int = None, delay: int = None, exceptions: tuple = None):
-    """ديكوريتر لإعادة المحاولة عند الفشل"""
+class HTTPStatusError(NetworkError):
+    """استثناء لاستجابات HTTP غير الناجحة (4xx و 5xx)"""
+    def __init__(self, status: int, url: str):
+        super().__init__(f"HTTP error {status} for {url}")
+        self.status = status
+        self.url = url
+
+class KnownBadURLError(NetworkError):
+    """استثناء لرابط فشل مؤخراً (أو فشل خادمه) فتم تجاوزه دون طلب"""
+    def __init__(self, url: str, reason: str):
+        super().__init__(f"Skipped known bad URL {url} ({reason})")
+        self.url = url
+        self.reason = reason
+
+MAX_RETRY_WAIT = 60  # الحد الأقصى للانتظار بين محاولتين (بالثواني)
+
+# أخطاء التليجرام النهائية (4xx) التي لا فائدة من إعادة المحاولة عندها
+NON_RETRYABLE_TELEGRAM_ERRORS = (
+    telegram_error.BadRequest,
+    telegram_error.Forbidden,
+    telegram_error.InvalidToken,
+    telegram_error.Conflict,
+    telegram_error.ChatMigrated,
+)
+
+def classify_error(error: Exception, exceptions: tuple) -> Tuple[bool, Optional[float]]:
+    """
+    تصنيف الخطأ: هل يمكن إعادة المحاولة؟ ومدة الانتظار المطلوبة إن حددها الخادم
+    """
+    # التليجرام يحدد مدة الانتظار عند تجاوز حد الطلبات
+    if isinstance(error, telegram_error.RetryAfter):
+        retry_after = error.retry_after
+        if hasattr(retry_after, 'total_seconds'):
+            retry_after = retry_after.total_seconds()
+        return True, float(retry_after)
+    if isinstance(error, NON_RETRYABLE_TELEGRAM_ERRORS):
+        return False, None
+    if isinstance(error, (telegram_error.TimedOut, telegram_error.NetworkError)):
+        return True, None
+
+    # رابط معروف بالفشل: لا فائدة من إعادة المحاولة قبل انتهاء مدته
+    if isinstance(error, KnownBadURLError):
+        return False, None
+
+    # أخطاء HTTP: لا إعادة عند 4xx باستثناء 429
+    status = getattr(error, 'status', None)
+    if status is None and isinstance(error, requests.HTTPError) and error.response is not None:
+        status = error.response.status_code
+    if status is not None:
+        return status == 429 or status >= 500, None
+
+    if isinstance(error, RateLimitError):
+        return True, None
+    return isinstance(error, exceptions), None
+
+def backoff_delay(delay: float, attempt: int) -> float:
+    """تأخير متزايد أسياً مع عشوائية (jitter) لتفادي تزامن المحاولات"""
+    base = min(delay * (2 ** attempt), MAX_RETRY_WAIT)
+    return base / 2 + random.uniform(0, base / 2)
+
+def retry_on_failure(max_retries: int = None, delay: int = None, exceptions: tuple = None,
+                     flood_controlled: bool = False):
+    """
+    ديكوريتر لإعادة المحاولة عند الفشل
+    يدعم الدوال العادية و async (انتظار غير معطل عبر asyncio.sleep)
+    flood_controlled: الدالة ترسل عبر telegram_rate_limiter الذي يعالج RetryAfter بنفسه،
+    فيُعاد رفعه مباشرة دون إعادة محاولة أو انتظار
+    """
     if max_retries is None:
         max_retries = MAX_RETRIES
     if delay is None:
@@ -26,33 +95,61 @@ def retry_on_failure(max_retries: int = None, delay: int = None, exceptions: tup
     if exceptions is None:
         exceptions = (requests.RequestException, NetworkError, ConnectionError, TimeoutError)
     
+    def get_wait_time(func: Callable, error: Exception, attempt: int) -> Optional[float]:
+        """إرجاع مدة الانتظار قبل المحاولة التالية، أو None إذا يجب رفع الخطأ"""
+        if flood_controlled and isinstance(error, telegram_error.RetryAfter):
+            return None
+        retryable, server_wait = classify_error(error, exceptions)
+        if not retryable:
+            logger.error(f"Non-retryable error in {func.__name__}: {error}")
+            return None
+        if attempt >= max_retries:
+            logger.error(
+                f"All {max_retries + 1} attempts failed for {func.__name__}: {error}"
+            )
+            return None
+
+        wait_time = server_wait if server_wait is not None else backoff_delay(delay, attempt)
+        logger.warning(
+            f"Attempt {attempt + 1} failed for {func.__name__}: {error}. "
+            f"Retrying in {wait_time:.1f} seconds..."
+        )
+        return wait_time
+
     def decorator(func: Callable) -> Callable:
+        if asyncio.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs) -> Any:
+                attempt = 0
+                while True:
+                    try:
+                        result = await func(*args, **kwargs)
+                        error_stats.record_retries(func.__name__, attempt, succeeded=True)
+                        return result
+                    except Exception as e:
+                        wait_time = get_wait_time(func, e, attempt)
+                        if wait_time is None:
+                            error_stats.record_retries(func.__name__, attempt, succeeded=False)
+                            raise
+                        await asyncio.sleep(wait_time)
+                        attempt += 1
+            return async_wrapper
+
         @wraps(func)
         def wrapper(*args, **kwargs) -> Any:
-            last_exception = None
-            
-            for attempt in range(max_retries + 1):
+            attempt = 0
+            while True:
                 try:
-                    return func(*args, **kwargs)
-                except exceptions as e:
-                    last_exception = e
-                    if attempt < max_retries:
-                        wait_time = delay * (2 ** attempt)  # تأخير متزايد
-                        logger.warning(
-                            f"Attempt {attempt + 1} failed for {func.__name__}: {e}. "
-                            f"Retrying in {wait_time} seconds..."
-                        )
-                        time.sleep(wait_time)
-                    else:
-                        logger.error(
-                            f"All {max_retries + 1} attempts failed for {func.__name__}: {e}"
-                        )
+                    result = func(*args, **kwargs)
+                    error_stats.record_retries(func.__name__, attempt, succeeded=True)
+                    return result
                 except Exception as e:
-                    # أخطاء غير قابلة للإعادة
-                    logger.error(f"Non-retryable error in {func.__name__}: {e}")
-                    raise
-            
-            raise last_exception
+                    wait_time = get_wait_time(func, e, attempt)
+                    if wait_time is None:
+                        error_stats.record_retries(func.__name__, attempt, succeeded=False)
+                        raise
+                    time.sleep(wait_time)
+                    attempt += 1
         return wrapper
     return decorator
 
@@ -97,28 +194,63 @@ def safe_post(url: str, **kwargs) -> Optional[requests.Response]:
     """POST request آمن مع إعادة المحاولة"""
     return safe_request(url, 'POST', **kwargs)
 
-def handle_telegram_error(func: Callable) -> Callable:
-    """ديكوريتر لمعالجة أخطاء التليجرام"""
+def _log_telegram_error(func: Callable, error: Exception, flood_controlled: bool = False) -> Optional[float]:
+    """
+    تسجيل خطأ التليجرام وإرجاع مدة الانتظار المطلوبة عند تجاوز حد الطلبات
+    (لا انتظار إذا كان محدد المعدل قد عالج RetryAfter)
+    """
+    error_msg = str(error).lower()
+    
+    if 'chat not found' in error_msg:
+        logger.error("Telegram chat not found. Check channel ID.")
+    elif 'bot was blocked' in error_msg:
+        logger.error("Bot was blocked by user.")
+    elif 'message is too long' in error_msg:
+        logger.error("Message too long for Telegram.")
+    elif 'file too large' in error_msg:
+        logger.error("File too large for Telegram.")
+    elif isinstance(error, telegram_error.RetryAfter) or 'flood control' in error_msg or 'too many requests' in error_msg:
+        if flood_controlled:
+            logger.error("Telegram rate limit exceeded; sending is paused by the rate limiter")
+            return None
+        _, retry_after = classify_error(error, ())
+        wait_time = retry_after if retry_after is not None else 60  # انتظار دقيقة افتراضياً
+        logger.error(f"Telegram rate limit exceeded. Waiting {wait_time:.0f} seconds...")
+        return wait_time
+    else:
+        logger.error(f"Telegram error in {func.__name__}: {error}")
+    return None
+
+def handle_telegram_error(func: Callable = None, *, flood_controlled: bool = False) -> Callable:
+    """
+    ديكوريتر لمعالجة أخطاء التليجرام.
+    يُستخدم كـ @handle_telegram_error أو @handle_telegram_error(flood_controlled=True)
+    للدوال التي ترسل عبر telegram_rate_limiter (لا انتظار إضافي عند RetryAfter)
+    """
+    if func is None:
+        return lambda decorated: handle_telegram_error(decorated, flood_controlled=flood_controlled)
+
+    if asyncio.iscoroutinefunction(func):
+        @wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            try:
+                return await func(*args, **kwargs)
+            except Exception as e:
+                wait_time = _log_telegram_error(func, e, flood_controlled)
+                if wait_time:
+                    await asyncio.sleep(wait_time)
+                # إعادة رفع الاستثناء للمعالجة في مستوى أعلى
+                raise
+        return async_wrapper
+
     @wraps(func)
     def wrapper(*args, **kwargs):
         try:
             return func(*args, **kwargs)
         except Exception as e:
-            error_msg = str(e).lower()
-            
-            if 'chat not found' in error_msg:
-                logger.error("Telegram chat not found. Check channel ID.")
-            elif 'bot was blocked' in error_msg:
-                logger.error("Bot was blocked by user.")
-            elif 'message is too long' in error_msg:
-                logger.error("Message too long for Telegram.")
-            elif 'file too large' in error_msg:
-                logger.error("File too large for Telegram.")
-            elif 'flood control' in error_msg or 'too many requests' in error_msg:
-                logger.error("Telegram rate limit exceeded. Waiting...")
-                time.sleep(60)  # انتظار دقيقة
-            else:
-                logger.error(f"Telegram error in {func.__name__}: {e}")
+            wait_time = _log_telegram_error(func, e, flood_controlled)
+            if wait_time:
+                time.sleep(wait_time)
             
             # إعادة رفع الاستثناء للمعالجة في مستوى أعلى
             raise
@@ -174,6 +306,7 @@ class ErrorStats:
         self.error_counts = {}
         self.last_errors = []
         self.max_last_errors = 50
+        self.retry_stats = {}
     
     def record_error(self, error: Exception, context: str = ""):
         """تسجيل خطأ في الإحصائيات"""
@@ -194,13 +327,31 @@ class ErrorStats:
         if len(self.last_errors) > self.max_last_errors:
             self.last_errors.pop(0)
     
+    def record_retries(self, func_name: str, retries: int, succeeded: bool = True):
+        """تسجيل عدد إعادات المحاولة لاستدعاء واحد"""
+        stats = self.retry_stats.setdefault(func_name, {
+            'calls': 0,
+            'retried_calls': 0,
+            'total_retries': 0,
+            'max_retries': 0,
+            'failed_calls': 0
+        })
+        stats['calls'] += 1
+        stats['total_retries'] += retries
+        stats['max_retries'] = max(stats['max_retries'], retries)
+        if retries:
+            stats['retried_calls'] += 1
+        if not succeeded:
+            stats['failed_calls'] += 1
+    
     def get_stats(self) -> dict:
         """الحصول على إحصائيات الأخطاء"""
         return {
             'error_counts': self.error_counts,
             'total_errors': sum(self.error_counts.values()),
             'recent_errors': len(self.last_errors),
-            'last_errors': self.last_errors[-10:]  # آخر 10 أخطاء
+            'last_errors': self.last_errors[-10:],  # آخر 10 أخطاء
+            'retries': self.retry_stats
         }
 
 # إنشاء مثيل عام لإحصائيات الأخطاء
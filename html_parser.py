@@ -0,0 +1,65 @@
+# html_parser.py
+
+import logging
+import soupsieve
+from bs4 import BeautifulSoup
+from config import HTML_PARSER
+from sources import NEWS_SOURCES
+
+logger = logging.getLogger(__name__)
+
+def _select_backend(preferred):
+    """اختيار محلل HTML: lxml (مكتوب بلغة C) إذا كان مثبتاً، وإلا html.parser"""
+    if preferred in ('auto', 'lxml'):
+        try:
+            import lxml  # noqa: F401
+            return 'lxml'
+        except ImportError:
+            if preferred == 'lxml':
+                logger.warning("lxml غير مثبت، سيتم استخدام html.parser")
+    return 'html.parser'
+
+PARSER_BACKEND = _select_backend(HTML_PARSER)
+
+def make_soup(content, backend=None):
+    """تحليل صفحة HTML باستخدام المحلل المختار"""
+    return BeautifulSoup(content, backend or PARSER_BACKEND)
+
+def compile_selectors(selectors):
+    """ترجمة محددات CSS مرة واحدة (soupsieve) مع تجاهل المحددات غير الصالحة"""
+    compiled = []
+    for selector in selectors:
+        try:
+            compiled.append(soupsieve.compile(selector))
+        except Exception as e:
+            logger.error(f"Invalid CSS selector '{selector}': {e}")
+    return tuple(compiled)
+
+class CompiledScrapingConfig:
+    """إعدادات الاستخراج لمصدر واحد مع محددات CSS مترجمة مسبقاً"""
+    def __init__(self, scraping_config):
+        scraping_config = scraping_config or {}
+        self.content_selectors = compile_selectors(scraping_config.get('content_selectors', []))
+        self.unwanted_selectors = compile_selectors(scraping_config.get('unwanted_selectors', []))
+        self.unwanted_phrases = scraping_config.get('unwanted_phrases', [])
+
+_compiled_configs = {}
+
+def get_compiled_config(source):
+    """إرجاع الإعدادات المترجمة للمصدر (تُترجم عند أول طلب ثم تُحفظ)"""
+    name = source.get('name')
+    compiled = _compiled_configs.get(name)
+    if compiled is None:
+        compiled = CompiledScrapingConfig(source.get('scraping_config'))
+        if name:
+            _compiled_configs[name] = compiled
+    return compiled
+
+def precompile_sources(sources):
+    """ترجمة محددات جميع المصادر مرة واحدة"""
+    for source in sources:
+        _compiled_configs[source['name']] = CompiledScrapingConfig(source.get('scraping_config'))
+    logger.info(f"Compiled CSS selectors for {len(sources)} sources (HTML parser: {PARSER_BACKEND})")
+
+# ترجمة محددات جميع المصادر مرة واحدة عند الاستيراد
+precompile_sources(NEWS_SOURCES)
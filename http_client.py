@@ -0,0 +1,195 @@
+# http_client.py
+
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Optional
+from urllib.parse import urlparse
+import aiohttp
+from config import HTTP_MAX_CONCURRENCY, HTTP_MAX_PER_HOST, HTTP_USER_AGENT, REQUEST_TIMEOUT
+from error_handler import NetworkError, HTTPStatusError
+from negative_cache import negative_cache
+
+logger = logging.getLogger(__name__)
+
+STREAM_CHUNK_SIZE = 64 * 1024  # حجم القطعة عند القراءة التدريجية
+
+class FetchResult:
+    """نتيجة طلب HTTP بعد قراءة المحتوى كاملاً"""
+    def __init__(self, url: str, status: int, headers, body: bytes = b'', truncated: bool = False):
+        self.url = url
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.truncated = truncated  # توقفت القراءة قبل نهاية المحتوى (الحد الأقصى أو الموعد النهائي أو اكتمال المطلوب)
+
+    @property
+    def ok(self) -> bool:
+        return self.status < 400
+
+    @property
+    def text(self) -> str:
+        """فك ترميز المحتوى حسب الترميز المعلن في الرؤوس"""
+        charset = 'utf-8'
+        content_type = self.headers.get('Content-Type', '')
+        if 'charset=' in content_type:
+            charset = content_type.split('charset=')[-1].split(';')[0].strip() or charset
+        try:
+            return self.body.decode(charset, errors='replace')
+        except LookupError:
+            return self.body.decode('utf-8', errors='replace')
+
+    def raise_for_status(self):
+        if self.status >= 400:
+            raise HTTPStatusError(self.status, self.url)
+
+class HttpClient:
+    """عميل HTTP غير متزامن مع حدود للتزامن الكلي ولكل خادم"""
+    def __init__(self, max_concurrency: int = HTTP_MAX_CONCURRENCY, max_per_host: int = HTTP_MAX_PER_HOST):
+        self.max_concurrency = max_concurrency
+        self.max_per_host = max_per_host
+        self._session = None
+        self._loop = None
+        self._global_limit = None
+        self._host_limits = {}
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """إنشاء الجلسة عند أول استخدام داخل event loop الحالي"""
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_concurrency,
+                limit_per_host=self.max_per_host,
+                ttl_dns_cache=300
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                headers={'User-Agent': HTTP_USER_AGENT}
+            )
+            self._loop = loop
+            self._global_limit = asyncio.Semaphore(self.max_concurrency)
+            self._host_limits = {}
+        return self._session
+
+    def _get_host_limit(self, url: str) -> asyncio.Semaphore:
+        host = urlparse(url).netloc.lower()
+        if host not in self._host_limits:
+            self._host_limits[host] = asyncio.Semaphore(self.max_per_host)
+        return self._host_limits[host]
+
+    async def fetch(self, url: str, headers: Optional[dict] = None, timeout: Optional[float] = None,
+                    max_bytes: Optional[int] = None, sniffer=None, remember_failures: bool = False) -> FetchResult:
+        """
+        جلب رابط وإرجاع الحالة والرؤوس والمحتوى.
+        مع max_bytes أو sniffer يُقرأ المحتوى تدريجياً: تتوقف القراءة عند تجاوز max_bytes،
+        أو عندما يرجع sniffer.feed(chunk) القيمة True، أو عند انتهاء المهلة الكلية
+        (ويُرجع ما تمت قراءته بدل الخطأ).
+        مع remember_failures تُحفظ الروابط الفاشلة في negative_cache، ويُرفع KnownBadURLError
+        فوراً دون طلب إذا كان الرابط أو خادمه فاشلاً مؤخراً
+        """
+        if remember_failures:
+            negative_cache.check(url)
+        try:
+            if max_bytes is None and sniffer is None:
+                result = await self._fetch_full(url, headers, timeout)
+            else:
+                result = await self._fetch_streaming(url, headers, timeout, max_bytes, sniffer)
+        except NetworkError as e:
+            if remember_failures:
+                negative_cache.record_failure(url, reason=str(e))
+            raise
+        if remember_failures:
+            self._record_status(url, result.status)
+        return result
+
+    @staticmethod
+    def _record_status(url, status):
+        if status >= 400:
+            negative_cache.record_failure(url, status)
+        else:
+            negative_cache.record_success(url)
+
+    async def _fetch_full(self, url, headers, timeout) -> FetchResult:
+        session = self._get_session()
+        client_timeout = aiohttp.ClientTimeout(total=timeout or REQUEST_TIMEOUT)
+
+        async with self._global_limit, self._get_host_limit(url):
+            try:
+                async with session.get(url, headers=headers, timeout=client_timeout) as response:
+                    body = await response.read()
+                    return FetchResult(str(response.url), response.status, response.headers, body)
+            except asyncio.TimeoutError:
+                raise NetworkError(f"Timeout error for {url}")
+            except aiohttp.ClientError as e:
+                raise NetworkError(f"Request error for {url}: {e}")
+
+    async def _fetch_streaming(self, url, headers, timeout, max_bytes, sniffer) -> FetchResult:
+        session = self._get_session()
+        deadline = asyncio.get_running_loop().time() + (timeout or REQUEST_TIMEOUT)
+        chunks = []
+        size = 0
+        response = None
+
+        async with self._global_limit, self._get_host_limit(url):
+            try:
+                async with asyncio.timeout_at(deadline):
+                    async with session.get(url, headers=headers, timeout=aiohttp.ClientTimeout(total=None)) as response:
+                        if response.status >= 400:
+                            return FetchResult(str(response.url), response.status, response.headers)
+                        async for chunk in response.content.iter_chunked(STREAM_CHUNK_SIZE):
+                            if max_bytes is not None and size + len(chunk) >= max_bytes:
+                                chunks.append(chunk[:max_bytes - size])
+                                logger.debug(f"Stopped reading {url} at {max_bytes} bytes")
+                                return FetchResult(str(response.url), response.status, response.headers, b''.join(chunks), truncated=True)
+                            chunks.append(chunk)
+                            size += len(chunk)
+                            if sniffer is not None and sniffer.feed(chunk):
+                                logger.debug(f"Stopped reading {url} after {size} bytes: needed elements found")
+                                return FetchResult(str(response.url), response.status, response.headers, b''.join(chunks), truncated=True)
+                        return FetchResult(str(response.url), response.status, response.headers, b''.join(chunks))
+            except TimeoutError:
+                # انتهت المهلة الكلية: نستخدم ما تمت قراءته إن وجد
+                if response is not None and chunks:
+                    logger.debug(f"Deadline reached for {url} after {size} bytes")
+                    return FetchResult(str(response.url), response.status, response.headers, b''.join(chunks), truncated=True)
+                raise NetworkError(f"Timeout error for {url}")
+            except aiohttp.ClientError as e:
+                raise NetworkError(f"Request error for {url}: {e}")
+
+    @asynccontextmanager
+    async def stream(self, url: str, headers: Optional[dict] = None, timeout: Optional[float] = None,
+                     remember_failures: bool = False):
+        """
+        فتح طلب للقراءة التدريجية بنفس حدود التزامن (مثل تحميل صورة إلى ملف).
+        المستدعي يقرأ response.content؛ المهلة الكلية تشمل القراءة.
+        remember_failures كما في fetch
+        """
+        if remember_failures:
+            negative_cache.check(url)
+        session = self._get_session()
+        client_timeout = aiohttp.ClientTimeout(total=timeout or REQUEST_TIMEOUT)
+
+        async with self._global_limit, self._get_host_limit(url):
+            try:
+                async with session.get(url, headers=headers, timeout=client_timeout) as response:
+                    if remember_failures:
+                        self._record_status(url, response.status)
+                    yield response
+            except asyncio.TimeoutError:
+                if remember_failures:
+                    negative_cache.record_failure(url, reason="timeout")
+                raise NetworkError(f"Timeout error for {url}")
+            except aiohttp.ClientError as e:
+                if remember_failures:
+                    negative_cache.record_failure(url, reason=str(e))
+                raise NetworkError(f"Request error for {url}: {e}")
+
+    async def close(self):
+        """إغلاق الجلسة عند إيقاف البوت"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        logger.info("HTTP client session closed")
+
+# إنشاء مثيل عام لعميل HTTP
+http_client = HttpClient()
@@ -0,0 +1,65 @@
+# image_normalizer.py
+
+import os
+import logging
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+OUTPUT_FORMATS = {
+    'jpeg': ('JPEG', '.jpg'),
+    'webp': ('WEBP', '.webp'),
+}
+
+def is_available() -> bool:
+    """هل مكتبة Pillow مثبتة؟"""
+    return Image is not None
+
+def _to_output_mode(image, pil_format):
+    """تحويل الصورة إلى نمط ألوان يقبله الترميز المطلوب (الشفافية تُدمج على خلفية بيضاء في JPEG)"""
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        if pil_format == 'JPEG':
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel('A'))
+            return background
+        return image
+    if image.mode != 'RGB':
+        return image.convert('RGB')
+    return image
+
+def normalize_image(source_path: str, output_path: str, max_side: int, output_format: str, quality: int):
+    """
+    تصغير الصورة إلى مقاس العرض في التليجرام وإعادة ترميزها (JPEG أو WebP بالجودة المحددة).
+    تُكتب النتيجة في output_path وتُرجع (الامتداد، الحجم)، أو None إذا كان الأصل
+    لا يحتاج إلى تصغير والنسخة الجديدة ليست أصغر منه (أو تعذر فتح الصورة)، فيُستخدم الأصل كما هو.
+    تُنفذ في عملية منفصلة عبر cpu_pool.
+    """
+    if Image is None:
+        return None
+
+    pil_format, extension = OUTPUT_FORMATS.get(output_format, OUTPUT_FORMATS['jpeg'])
+    try:
+        with Image.open(source_path) as image:
+            needs_resize = max(image.size) > max_side
+            # فك ترميز JPEG بمقاس مصغر مباشرة (أسرع بكثير للصور الكبيرة)
+            image.draft('RGB', (max_side, max_side))
+            image = ImageOps.exif_transpose(image)
+            if needs_resize:
+                image.thumbnail((max_side, max_side), Image.LANCZOS)
+            image = _to_output_mode(image, pil_format)
+            image.save(output_path, pil_format, quality=quality, optimize=True)
+    except Exception as e:
+        logger.warning(f"Image normalisation failed for {source_path}: {e}")
+        return None
+
+    size = os.path.getsize(output_path)
+    if not needs_resize and size >= os.path.getsize(source_path):
+        # الأصل صغير أصلاً: لا فائدة من النسخة الجديدة
+        os.remove(output_path)
+        return None
+    return extension, size
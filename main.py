@@ -3,21 +3,37 @@
 # ==================== بوت أخبار الجزائر - نقطة البداية ====================
 # الملف الرئيسي لتشغيل بوت أخبار الجزائر
 
-import asyncio
 import logging
 import sys
 import os
-from bot import main as bot_main
+import time
+
+# كل ما يُنفذ عند الاستيراد يجب أن يبقى خفيفاً: عمليات cpu_pool (spawn) تعيد استيراد هذا الملف
+# باسم __mp_main__، لذلك استيراد البوت وإعداد التسجيل داخل كتلة __main__ فقط
+
+# --- Self-ping keep_alive thread ---
+def keep_alive():
+    import requests
 
-# ==================== إعدادات التسجيل ====================
-logging.basicConfig(
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    level=logging.INFO
-)
+    url = os.getenv('RENDER_EXTERNAL_URL', 'https://your-app-name.onrender.com')
+    interval = 30
+    while True:
+        try:
+            res = requests.get(url)
+            print(f"Pinged at {time.strftime('%Y-%m-%d %H:%M:%S')}, status: {res.status_code}")
+        except Exception as e:
+            print(f"Error pinging: {e}")
+        time.sleep(interval)
 
 # ==================== نقطة البداية الرئيسية ====================
 
 if __name__ == "__main__":
+    # ==================== إعدادات التسجيل ====================
+    logging.basicConfig(
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        level=logging.INFO
+    )
+
     print("🤖 بدء تشغيل بوت أخبار الجزائر...")
     print("⚠️  اضغط Ctrl+C لإيقاف البوت")
     
@@ -31,6 +47,8 @@ if __name__ == "__main__":
         sys.exit(1)
     
     print("✅ تم التحقق من متغيرات البيئة")
+
+    from bot import main as bot_main
     
     try:
         # تشغيل البوت الرئيسي
@@ -43,22 +61,3 @@ if __name__ == "__main__":
     finally:
         print("🔒 تم إغلاق البوت.")
         sys.exit(0)
-
-# --- Self-ping keep_alive thread ---
-import threading
-import time
-import requests
-import os
-
-def keep_alive():
-    url = os.getenv('RENDER_EXTERNAL_URL', 'https://your-app-name.onrender.com')
-    interval = 30
-    while True:
-        try:
-            res = requests.get(url)
-            print(f"Pinged at {time.strftime('%Y-%m-%d %H:%M:%S')}, status: {res.status_code}")
-        except Exception as e:
-            print(f"Error pinging: {e}")
-        time.sleep(interval)
-
-threading.Thread(target=keep_alive, daemon=True).start()
@@ -3,8 +3,12 @@
 import logging
 import re
 from urllib.parse import urljoin, urlparse
-import requests
-from bs4 import BeautifulSoup
+from http_client import http_client
+from cpu_pool import cpu_pool
+from html_parser import make_soup
+from page_sniffer import PageSniffer
+from config import ARTICLE_MAX_BYTES, ARTICLE_FETCH_DEADLINE
+from error_handler import KnownBadURLError
 
 logger = logging.getLogger(__name__)
 
@@ -21,7 +25,45 @@ def is_valid_url(url):
     except Exception:
         return False
 
-def extract_video_url(article_url):
+def _find_video_url(html, article_url):
+    """
+    البحث عن رابط الفيديو في محتوى صفحة المقال
+    """
+    return find_video_in_soup(make_soup(html), article_url)
+
+def find_video_in_soup(soup, article_url):
+    """
+    البحث عن رابط الفيديو في صفحة مقال محللة مسبقاً (دون إعادة التحليل)
+    """
+    # البحث عن وسوم الفيديو
+    video_tag = soup.find('video')
+    if video_tag and video_tag.get('src'):
+        video_url = video_tag.get('src')
+        if not video_url.startswith(('http://', 'https://')):
+            video_url = urljoin(article_url, video_url)
+        return video_url
+        
+    # البحث عن وسوم iframe (يوتيوب، فيسبوك، إلخ)
+    iframe = soup.find('iframe', src=re.compile(r'(youtube|facebook|twitter|vimeo)'))
+    if iframe and iframe.get('src'):
+        return iframe.get('src')
+        
+    # البحث عن روابط الفيديو في الصفحة
+    video_links = soup.find_all('a', href=re.compile(r'\.(mp4|avi|mov|wmv)$'))
+    if video_links:
+        video_url = video_links[0].get('href')
+        if not video_url.startswith(('http://', 'https://')):
+            video_url = urljoin(article_url, video_url)
+        return video_url
+        
+    # البحث عن روابط يوتيوب
+    youtube_links = soup.find_all('a', href=re.compile(r'youtube\.com/watch|youtu\.be/'))
+    if youtube_links:
+        return youtube_links[0].get('href')
+        
+    return None
+
+async def extract_video_url(article_url):
     """
     استخراج رابط الفيديو من صفحة المقال إن وجد
     """
@@ -29,40 +71,19 @@ def extract_video_url(article_url):
         return None
         
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        response = requests.get(article_url, headers=headers, timeout=10)
+        # قراءة تدريجية تتوقف عند أول فيديو أو عند الحد الأقصى للحجم
+        response = await http_client.fetch(
+            article_url,
+            timeout=ARTICLE_FETCH_DEADLINE,
+            max_bytes=ARTICLE_MAX_BYTES,
+            sniffer=PageSniffer(needs_content=False),
+            remember_failures=True
+        )
         response.raise_for_status()
         
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # البحث عن وسوم الفيديو
-        video_tag = soup.find('video')
-        if video_tag and video_tag.get('src'):
-            video_url = video_tag.get('src')
-            if not video_url.startswith(('http://', 'https://')):
-                video_url = urljoin(article_url, video_url)
-            return video_url
-            
-        # البحث عن وسوم iframe (يوتيوب، فيسبوك، إلخ)
-        iframe = soup.find('iframe', src=re.compile(r'(youtube|facebook|twitter|vimeo)'))
-        if iframe and iframe.get('src'):
-            return iframe.get('src')
-            
-        # البحث عن روابط الفيديو في الصفحة
-        video_links = soup.find_all('a', href=re.compile(r'\.(mp4|avi|mov|wmv)$'))
-        if video_links:
-            video_url = video_links[0].get('href')
-            if not video_url.startswith(('http://', 'https://')):
-                video_url = urljoin(article_url, video_url)
-            return video_url
-            
-        # البحث عن روابط يوتيوب
-        youtube_links = soup.find_all('a', href=re.compile(r'youtube\.com/watch|youtu\.be/'))
-        if youtube_links:
-            return youtube_links[0].get('href')
-            
+        return await cpu_pool.run(_find_video_url, response.body, article_url)
+    except KnownBadURLError as e:
+        logger.info(str(e))
         return None
     except Exception as e:
         logger.error(f"Error extracting video URL from {article_url}: {e}")
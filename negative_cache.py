@@ -0,0 +1,95 @@
+# negative_cache.py
+
+import time
+import logging
+from collections import OrderedDict
+from urllib.parse import urlparse
+from config import (
+    NEGATIVE_CACHE_TTL, NEGATIVE_CACHE_TRANSIENT_TTL, NEGATIVE_CACHE_SIZE,
+    NEGATIVE_HOST_THRESHOLD, NEGATIVE_HOST_TTL
+)
+from error_handler import KnownBadURLError
+
+logger = logging.getLogger(__name__)
+
+# حالات نهائية: الرابط نفسه غير صالح والخادم سليم
+PERMANENT_STATUSES = {400, 401, 404, 410, 451}
+
+def _host(url: str) -> str:
+    return urlparse(url).netloc.lower()
+
+class NegativeCache:
+    """
+    تذكر الروابط الفاشلة (404، انتهاء المهلة، الحظر...) لمدة محدودة حتى لا يُعاد طلبها
+    في كل إعادة إرسال، مع حظر مؤقت للخادم بعد عدة أخطاء متتالية (مهلة أو 403 أو 429 أو 5xx)
+    """
+    def __init__(self, max_size: int = NEGATIVE_CACHE_SIZE):
+        self.max_size = max_size
+        self._urls = OrderedDict()  # الرابط -> (وقت الانتهاء، السبب)
+        self._host_failures = {}  # الخادم -> عدد الأخطاء المتتالية
+        self._blocked_hosts = {}  # الخادم -> (وقت الانتهاء، السبب)
+        self.skipped = 0
+
+    @staticmethod
+    def _is_permanent(status) -> bool:
+        return status in PERMANENT_STATUSES
+
+    def check(self, url: str):
+        """رفع KnownBadURLError إذا كان الرابط أو خادمه فاشلاً مؤخراً"""
+        now = time.monotonic()
+        entry = self._urls.get(url)
+        if entry is not None:
+            if now < entry[0]:
+                self.skipped += 1
+                raise KnownBadURLError(url, entry[1])
+            del self._urls[url]
+
+        host = _host(url)
+        blocked = self._blocked_hosts.get(host)
+        if blocked is not None:
+            if now < blocked[0]:
+                self.skipped += 1
+                raise KnownBadURLError(url, f"host {host}: {blocked[1]}")
+            del self._blocked_hosts[host]
+
+    def is_known_bad(self, url: str) -> bool:
+        try:
+            self.check(url)
+        except KnownBadURLError:
+            return True
+        return False
+
+    def record_failure(self, url: str, status=None, reason: str = None):
+        """تسجيل فشل طلب: الحالات النهائية تُحفظ مدة أطول، والأخطاء المؤقتة تُحتسب على الخادم أيضاً"""
+        reason = reason or (f"HTTP {status}" if status else "network error")
+        now = time.monotonic()
+        ttl = NEGATIVE_CACHE_TTL if self._is_permanent(status) else NEGATIVE_CACHE_TRANSIENT_TTL
+        self._urls[url] = (now + ttl, reason)
+        self._urls.move_to_end(url)
+        while len(self._urls) > self.max_size:
+            self._urls.popitem(last=False)
+
+        if self._is_permanent(status):
+            return
+        host = _host(url)
+        failures = self._host_failures.get(host, 0) + 1
+        self._host_failures[host] = failures
+        if failures >= NEGATIVE_HOST_THRESHOLD:
+            self._blocked_hosts[host] = (now + NEGATIVE_HOST_TTL, reason)
+            self._host_failures.pop(host, None)
+            logger.warning(f"Host {host} skipped for {NEGATIVE_HOST_TTL}s after {failures} consecutive failures ({reason})")
+
+    def record_success(self, url: str):
+        """نجاح طلب يلغي عداد أخطاء الخادم"""
+        self._host_failures.pop(_host(url), None)
+
+    def get_stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            'bad_urls': sum(1 for expires_at, _ in self._urls.values() if expires_at > now),
+            'blocked_hosts': [host for host, (expires_at, _) in self._blocked_hosts.items() if expires_at > now],
+            'skipped_requests': self.skipped,
+        }
+
+# إنشاء مثيل عام للروابط الفاشلة
+negative_cache = NegativeCache()
@@ -0,0 +1,132 @@
+# page_sniffer.py
+
+import re
+
+SIMPLE_SELECTOR_PATTERN = re.compile(r'^([a-zA-Z][a-zA-Z0-9]*)?(?:([.#])([\w-]+))?$')
+VIDEO_PATTERN = re.compile(
+    rb'<video\b[^>]{0,1000}?\ssrc\s*=|<iframe\b[^>]{0,1000}?\ssrc\s*=\s*["\']?[^"\'>]*(?:youtube|facebook|twitter|vimeo)',
+    re.IGNORECASE
+)
+# أطول من أطول نمط (الوسم الافتتاحي مع حتى 2000 بايت من السمات): المطابقات التي تنتهي في آخر
+# WINDOW_OVERLAP بايت لا تُعتمد، لأن \b ونظرة الأمام تنجح زوراً عند نهاية النافذة
+# (مثل "<div" من "<divider")، بل تبقى هذه البايتات لتُفحص مع القطعة التالية
+WINDOW_OVERLAP = 4096
+
+def _parse_simple_selector(selector):
+    """
+    تحويل محدد CSS بسيط (tag أو .class أو #id أو tag.class) إلى (الوسم، النوع، القيمة)؛
+    المحددات المركبة ترجع None ولا يمكن تتبعها أثناء القراءة التدريجية
+    """
+    match = SIMPLE_SELECTOR_PATTERN.match(selector.strip())
+    if not match or not (match.group(1) or match.group(3)):
+        return None
+    tag, kind, value = match.groups()
+    return (tag.lower() if tag else None, kind, value)
+
+def _opening_tag_pattern(tag, kind, value):
+    """نمط بايتات يطابق الوسم الافتتاحي للمحدد، والمجموعة الأولى هي اسم الوسم"""
+    tag_name = re.escape(tag).encode() if tag else rb'[a-zA-Z][a-zA-Z0-9]*'
+    if kind is None:
+        return re.compile(rb'<(' + tag_name + rb')\b', re.IGNORECASE)
+    attribute = b'class' if kind == '.' else b'id'
+    if kind == '.':
+        # القيمة كلمة ضمن قائمة الأصناف
+        attribute_value = rb'["\']?[^"\'>]*?(?<![\w-])' + re.escape(value).encode() + rb'(?![\w-])'
+    else:
+        attribute_value = rb'["\']?' + re.escape(value).encode() + rb'(?![\w-])'
+    return re.compile(
+        rb'<(' + tag_name + rb')\b[^>]{0,2000}?\s' + attribute + rb'\s*=\s*' + attribute_value,
+        re.IGNORECASE
+    )
+
+class PageSniffer:
+    """
+    فحص سريع لبايتات الصفحة أثناء تحميلها (تعابير منتظمة فقط، دون تحليل HTML على event loop)
+    يخبر بإمكانية إيقاف التحميل عند العثور على ما يحتاجه البوت:
+    - صفحة المقال: إغلاق حاوية المحتوى الخاصة بأول محدد (تأتي بعد <head> فتكون og:image
+      وتاريخ النشر قد قُرئت). يُنشأ عبر for_content فقط عندما يكون المحدد الأول بسيطاً
+    - البحث عن الفيديو فقط (needs_content=False): أول فيديو
+    التحليل الكامل يتم لاحقاً خارج event loop على المحتوى المقروء
+    """
+    def __init__(self, opening_pattern=None, needs_content=True):
+        self._opening_pattern = opening_pattern
+        self.needs_content = needs_content
+        self._tail = b''
+        self._tag_pattern = None  # أنماط فتح وإغلاق وسم الحاوية بعد العثور عليها
+        self._depth = 0
+        self._in_script = False
+        self.video_found = False
+        self.content_closed = False
+
+    @classmethod
+    def for_content(cls, content_selectors):
+        """
+        إنشاء فاحص لصفحة مقال، أو None إذا لم يمكن إيقاف التحميل مبكراً:
+        _parse_article_page يستخدم أول محدد يطابق، فلا يكفي إغلاق حاوية محدد لاحق
+        """
+        if not content_selectors:
+            return None
+        parsed = _parse_simple_selector(content_selectors[0])
+        if parsed is None:
+            return None
+        return cls(_opening_tag_pattern(*parsed))
+
+    @property
+    def done(self) -> bool:
+        """هل اكتمل كل المطلوب من الصفحة؟"""
+        if self.needs_content:
+            return self.content_closed
+        return self.video_found
+
+    def _scan(self, window, limit):
+        """
+        البحث عن الحاوية ثم عد فتح وإغلاق وسمها (مع تجاهل محتوى <script>) حتى يعود العمق إلى صفر.
+        تُعتمد فقط المطابقات المنتهية قبل limit، ويُرجع موضع أول بايت لم يُعالج بعد
+        """
+        start = 0
+        if self._tag_pattern is None:
+            match = self._opening_pattern.search(window)
+            if match is None:
+                return limit
+            if match.end() > limit:
+                return match.start()
+            tag = re.escape(match.group(1).lower())
+            self._tag_pattern = re.compile(rb'</?(?:' + tag + rb'|script)\b', re.IGNORECASE)
+            self._depth = 1
+            start = match.end()
+
+        for match in self._tag_pattern.finditer(window, start):
+            if match.end() > limit:
+                return match.start()
+            token = match.group(0).lower()
+            if self._in_script:
+                if token.startswith(b'</script'):
+                    self._in_script = False
+            elif token.startswith(b'<script'):
+                self._in_script = True
+            elif token.startswith(b'</script'):
+                continue
+            elif token.startswith(b'</'):
+                self._depth -= 1
+                if self._depth == 0:
+                    self.content_closed = True
+                    return limit
+            else:
+                self._depth += 1
+        return limit
+
+    def feed(self, chunk):
+        """تغذية قطعة من المحتوى (bytes) وإرجاع True إذا أمكن إيقاف التحميل"""
+        if self.done:
+            return True
+        window = self._tail + chunk
+
+        if not self.needs_content:
+            # نمط الفيديو لا ينتهي بحد كلمة، فتكفي إعادة فحص آخر البايتات مع القطعة التالية
+            self.video_found = VIDEO_PATTERN.search(window) is not None
+            self._tail = window[-WINDOW_OVERLAP:]
+            return self.done
+
+        cut = self._scan(window, max(len(window) - WINDOW_OVERLAP, 0))
+        self._tail = window[cut:]
+        return self.done
@@ -0,0 +1,104 @@
+# priority_queue.py
+
+import heapq
+import itertools
+import time
+
+# رتبة المقال: الأصغر يُنشر أولاً
+RANK_URGENT = 0
+RANK_LOCAL = 1
+RANK_OFFICIAL = 2
+RANK_ECONOMIC = 3
+RANK_OTHER = 4
+RANK_SPORTS = 5
+
+URGENT_KEYWORDS = ['عاجل', 'طارئ', 'انفجار', 'حادث', 'وفاة', 'استقالة', 'إعلان هام', 'قرار عاجل']
+
+# كل درجة في الرتبة تعادل هذا العدد من الثواني من الانتظار (الترقية بالعمر):
+# خبر رياضي أقدم بـ 50 دقيقة يسبق خبراً عاجلاً جديداً، فلا يبقى أي خبر في الانتظار إلى الأبد
+AGING_SECONDS = 600
+SOURCE_PRIORITY_SECONDS = 10  # ترجيح بسيط حسب أولوية المصدر (1 إلى 7) داخل نفس الرتبة
+SOURCE_TURN_SECONDS = 60  # فاصل أدنى بين خبرين متتاليين من نفس المصدر (التناوب بين المصادر)
+
+def article_rank(article, source_config) -> int:
+    """حساب رتبة المقال حسب الاستعجال والبلد والفئة"""
+    title_lower = article.title.lower()
+    if any(keyword in title_lower for keyword in URGENT_KEYWORDS):
+        return RANK_URGENT
+    if source_config.get('country', 'Unknown') == 'DZ':
+        return RANK_LOCAL
+    if article.category == 'official':
+        return RANK_OFFICIAL
+    if article.category in ['economic', 'اقتصاد']:
+        return RANK_ECONOMIC
+    if article.category in ['sports', 'رياضة']:
+        return RANK_SPORTS
+    return RANK_OTHER
+
+class ArticlePriorityQueue:
+    """
+    طابور أولوية (heap) للمقالات بمفتاح ثابت: وقت الإضافة + الرتبة × AGING_SECONDS.
+    لكل مصدر heap خاص، وheap علوي يختار المصدر التالي، مع فاصل SOURCE_TURN_SECONDS
+    بين خبرين من نفس المصدر. الإضافة والسحب O(log n).
+    الأخبار العاجلة لا تخضع لهذا الفاصل، والفاصل لا ينتقل إلى الدفعة التالية بعد تفريغ الطابور.
+    المفتاح الناتج يُحفظ في صندوق الإرسال فيبقى الترتيب صحيحاً بين الدورات وبعد إعادة التشغيل.
+    """
+    def __init__(self):
+        self._counter = itertools.count()
+        self._source_heaps = {}  # المصدر -> [(المفتاح، الترتيب، الرتبة، المقال)]
+        self._sources_heap = []  # [(مفتاح المصدر، الترتيب، المصدر)]
+        self._source_keys = {}  # المفتاح الحالي الصالح لكل مصدر في الـ heap العلوي
+        self._next_free = {}  # أقرب مفتاح مسموح للمصدر بعد آخر خبر منه
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def _schedule_source(self, source):
+        """(إعادة) إدراج المصدر في الـ heap العلوي حسب أقرب مقال فيه؛ المداخل القديمة تُتجاهل عند السحب"""
+        head_key, _, head_rank, _ = self._source_heaps[source][0]
+        if head_rank == RANK_URGENT:
+            key = head_key  # الخبر العاجل لا ينتظر دور مصدره
+        else:
+            key = max(head_key, self._next_free.get(source, head_key))
+        if self._source_keys.get(source) == key:
+            return
+        self._source_keys[source] = key
+        heapq.heappush(self._sources_heap, (key, next(self._counter), source))
+
+    def push(self, article, rank: int, source_priority: int = None, enqueued_at: float = None):
+        """إضافة مقال بمفتاح ثابت محسوب من وقت الإضافة والرتبة"""
+        enqueued_at = time.time() if enqueued_at is None else enqueued_at
+        key = enqueued_at + rank * AGING_SECONDS + (source_priority or 0) * SOURCE_PRIORITY_SECONDS
+        heap = self._source_heaps.setdefault(article.source, [])
+        heapq.heappush(heap, (key, next(self._counter), rank, article))
+        self._size += 1
+        self._schedule_source(article.source)
+
+    def pop(self):
+        """سحب المقال التالي مع مفتاحه الفعلي (بعد تطبيق التناوب بين المصادر)"""
+        while self._sources_heap:
+            key, _, source = heapq.heappop(self._sources_heap)
+            if self._source_keys.get(source) != key:
+                continue  # مدخل قديم
+            del self._source_keys[source]
+
+            _, _, _, article = heapq.heappop(self._source_heaps[source])
+            self._size -= 1
+            self._next_free[source] = key + SOURCE_TURN_SECONDS
+            if self._source_heaps[source]:
+                self._schedule_source(source)
+            else:
+                del self._source_heaps[source]
+            if not self._size:
+                # الطابور فارغ: الدفعة التالية تبدأ من مفاتيحها الطبيعية
+                self._next_free.clear()
+            return key, article
+        raise IndexError("pop from an empty ArticlePriorityQueue")
+
+    def drain(self):
+        """سحب جميع المقالات بالترتيب: قائمة (المفتاح، المقال)"""
+        return [self.pop() for _ in range(self._size)]
+
+# إنشاء مثيل عام لطابور أولوية المقالات
+article_queue = ArticlePriorityQueue()
@@ -0,0 +1,102 @@
+# publisher.py
+
+import asyncio
+import logging
+from telegram.error import RetryAfter
+from config import OUTBOX_POLL_INTERVAL, OUTBOX_RETRY_DELAY, OUTBOX_MAX_ATTEMPTS
+from database import get_next_outbox_item, complete_outbox_item, defer_outbox_item
+from db_writer import db_writer
+
+logger = logging.getLogger(__name__)
+
+class OutboxPublisher:
+    """
+    ناشر مستقل يفرغ صندوق الإرسال (outbox) بالترتيب حسب الأولوية.
+    الجلب يضيف إلى الصندوق فقط، فلا يتأثر زمن الجلب بزمن الإرسال
+    """
+    def __init__(self):
+        self._task = None
+        self._wakeup = None
+        self.published = 0
+        self.failed = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self, publish):
+        """
+        تشغيل الناشر على event loop الحالي.
+        publish(article) دالة async ترجع True عند نجاح النشر
+        """
+        if self.running:
+            return
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run(publish))
+        logger.info("Outbox publisher started")
+
+    async def stop(self):
+        """إيقاف الناشر؛ العناصر غير المنشورة تبقى في الصندوق"""
+        if not self.running:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        logger.info("Outbox publisher stopped")
+
+    def wake(self):
+        """تنبيه الناشر بوجود عناصر جديدة في الصندوق"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _wait_for_items(self):
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=OUTBOX_POLL_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+
+    async def _defer(self, item, article):
+        """تسجيل محاولة فاشلة للعنصر وتأجيله، أو إسقاطه بعد OUTBOX_MAX_ATTEMPTS"""
+        self.failed += 1
+        will_retry = await db_writer.submit(defer_outbox_item, item.id, OUTBOX_RETRY_DELAY, OUTBOX_MAX_ATTEMPTS)
+        if not will_retry:
+            logger.error(f"Dropping article {article.id} from outbox after {OUTBOX_MAX_ATTEMPTS} failed attempts")
+
+    async def _run(self, publish):
+        while True:
+            entry = None
+            try:
+                entry = await asyncio.to_thread(get_next_outbox_item)
+                if entry is None:
+                    await self._wait_for_items()
+                    continue
+
+                item, article = entry
+                if await publish(article):
+                    await db_writer.submit(complete_outbox_item, item.id, article.id)
+                    self.published += 1
+                else:
+                    await self._defer(item, article)
+            except asyncio.CancelledError:
+                raise
+            except RetryAfter as e:
+                # محدد المعدل أوقف كل الإرسالات المدة المطلوبة: يُعاد العنصر نفسه بعدها دون احتساب محاولة
+                logger.warning(f"Outbox publisher flood-limited, retrying after {e.retry_after}s")
+            except Exception as e:
+                logger.error(f"Outbox publisher error: {e}")
+                if entry is None:
+                    await asyncio.sleep(OUTBOX_POLL_INTERVAL)
+                    continue
+                # فشل قبل الإرسال (التصنيف أو تجهيز المحتوى...): تأجيل العنصر حتى لا يسد رأس الصندوق
+                try:
+                    await self._defer(*entry)
+                except Exception as defer_error:
+                    logger.error(f"Outbox publisher failed to defer item: {defer_error}")
+                    await asyncio.sleep(OUTBOX_POLL_INTERVAL)
+
+# إنشاء مثيل عام لناشر صندوق الإرسال
+outbox_publisher = OutboxPublisher()
@@ -0,0 +1,129 @@
+# rate_limiter.py
+
+import time
+import asyncio
+import logging
+from telegram.error import RetryAfter
+from config import TELEGRAM_GLOBAL_RATE, CHANNEL_MIN_INTERVAL, PRIVATE_CHAT_RATE
+
+logger = logging.getLogger(__name__)
+
+MAX_FLOOD_RETRIES = 3  # عدد مرات إعادة الإرسال بعد RetryAfter
+MAX_CHAT_BUCKETS = 1000  # الحد الأقصى لعدد دلاء المحادثات المحفوظة في الذاكرة
+
+class TokenBucket:
+    """دلو رموز (token bucket): معدل ثابت مع سعة للدفعات القصيرة"""
+    def __init__(self, rate: float, capacity: float = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self) -> float:
+        """
+        حجز رمز وإرجاع مدة الانتظار قبل استخدامه.
+        الرصيد قد يصبح سالباً فيُخدم الطالبون بترتيب وصولهم دون قفل.
+        """
+        self._refill(time.monotonic())
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+    @property
+    def idle(self) -> bool:
+        """هل امتلأ الدلو (لا حجوزات معلقة)؟"""
+        self._refill(time.monotonic())
+        return self.tokens >= self.capacity
+
+class TelegramRateLimiter:
+    """
+    جدولة الإرسال حسب حدود التليجرام: حد عام للبوت وحد لكل محادثة،
+    مع إيقاف جميع الإرسالات للمدة التي يطلبها RetryAfter
+    """
+    def __init__(self, global_rate: float = TELEGRAM_GLOBAL_RATE,
+                 channel_min_interval: float = CHANNEL_MIN_INTERVAL,
+                 private_chat_rate: float = PRIVATE_CHAT_RATE):
+        self.global_bucket = TokenBucket(global_rate, capacity=global_rate)
+        self.channel_min_interval = channel_min_interval
+        self.private_chat_rate = private_chat_rate
+        self.chat_buckets = {}
+        self.paused_until = 0.0
+        self.messages_sent = 0
+        self.flood_pauses = 0
+
+    def _is_private_chat(self, chat_id) -> bool:
+        # معرفات المستخدمين موجبة، أما القنوات والمجموعات فسالبة أو تبدأ بـ @
+        try:
+            return int(chat_id) > 0
+        except (TypeError, ValueError):
+            return False
+
+    def _get_chat_bucket(self, chat_id) -> TokenBucket:
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self.chat_buckets) >= MAX_CHAT_BUCKETS:
+                self.chat_buckets = {key: value for key, value in self.chat_buckets.items() if not value.idle}
+            if self._is_private_chat(chat_id):
+                bucket = TokenBucket(self.private_chat_rate)
+            else:
+                bucket = TokenBucket(1 / self.channel_min_interval if self.channel_min_interval > 0 else TELEGRAM_GLOBAL_RATE)
+            self.chat_buckets[chat_id] = bucket
+        return bucket
+
+    async def _wait_for_pause(self):
+        while True:
+            remaining = self.paused_until - time.monotonic()
+            if remaining <= 0:
+                return
+            await asyncio.sleep(remaining)
+
+    async def acquire(self, chat_id):
+        """الانتظار حتى يسمح حد المحادثة والحد العام بإرسال رسالة"""
+        await self._wait_for_pause()
+        wait_time = self._get_chat_bucket(chat_id).reserve()
+        if wait_time > 0:
+            await asyncio.sleep(wait_time)
+
+        await self._wait_for_pause()
+        wait_time = self.global_bucket.reserve()
+        if wait_time > 0:
+            await asyncio.sleep(wait_time)
+        self.messages_sent += 1
+
+    def pause(self, retry_after: float):
+        """إيقاف جميع الإرسالات للمدة التي طلبها التليجرام"""
+        if hasattr(retry_after, 'total_seconds'):
+            retry_after = retry_after.total_seconds()
+        self.paused_until = max(self.paused_until, time.monotonic() + float(retry_after))
+        self.flood_pauses += 1
+        logger.warning(f"Telegram flood control: pausing all sends for {float(retry_after):.0f} seconds")
+
+    async def send(self, chat_id, method, **kwargs):
+        """
+        إرسال عبر دالة البوت method(chat_id=..., **kwargs) مع احترام الحدود.
+        عند RetryAfter يتوقف الإرسال المدة المطلوبة بالضبط ثم يُعاد.
+        """
+        for attempt in range(MAX_FLOOD_RETRIES + 1):
+            await self.acquire(chat_id)
+            try:
+                return await method(chat_id=chat_id, **kwargs)
+            except RetryAfter as e:
+                self.pause(e.retry_after)
+                if attempt >= MAX_FLOOD_RETRIES:
+                    raise
+
+    def get_status(self) -> dict:
+        return {
+            'messages_sent': self.messages_sent,
+            'flood_pauses': self.flood_pauses,
+            'paused_for_seconds': round(max(0.0, self.paused_until - time.monotonic()), 1),
+            'tracked_chats': len(self.chat_buckets),
+        }
+
+# إنشاء مثيل عام لمحدد معدل الإرسال
+telegram_rate_limiter = TelegramRateLimiter()
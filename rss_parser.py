@@ -1,14 +1,65 @@
 # rss_parser.py
 
+import asyncio
+import hashlib
 import feedparser
 import logging
 from datetime import datetime
 from time import mktime
 from urllib.parse import urljoin
 import re
+from http_client import http_client
+from cpu_pool import cpu_pool
+from database import load_feed_states, save_feed_state
+from db_writer import db_writer
 
 logger = logging.getLogger(__name__)
 
+class FeedStateStore:
+    """Keeps per-feed HTTP validators (ETag, Last-Modified, body hash) in memory and in the database."""
+    def __init__(self):
+        self._states = None
+        self._pending = {}
+
+    async def _ensure_loaded(self):
+        if self._states is None:
+            self._states = await asyncio.to_thread(load_feed_states)
+            logger.info(f"Loaded HTTP validators for {len(self._states)} feeds")
+
+    async def get_request_headers(self, url):
+        """Returns the conditional GET headers for a feed."""
+        await self._ensure_loaded()
+        state = self._states.get(url, {})
+        headers = {}
+        if state.get('etag'):
+            headers['If-None-Match'] = state['etag']
+        if state.get('last_modified'):
+            headers['If-Modified-Since'] = state['last_modified']
+        return headers
+
+    def is_unchanged(self, url, content_hash):
+        return self._states.get(url, {}).get('content_hash') == content_hash
+
+    def stage(self, url, etag, last_modified, content_hash):
+        """Holds new validators until the feed's entries have been processed."""
+        self._pending[url] = {'etag': etag, 'last_modified': last_modified, 'content_hash': content_hash}
+
+    async def confirm(self, url):
+        """Persists the staged validators once the feed was processed successfully."""
+        state = self._pending.pop(url, None)
+        if state is None:
+            return
+        try:
+            await db_writer.submit(save_feed_state, url, state['etag'], state['last_modified'], state['content_hash'])
+            self._states[url] = state
+        except Exception as e:
+            logger.error(f"Error saving HTTP validators for {url}: {e}")
+
+    def discard(self, url):
+        self._pending.pop(url, None)
+
+feed_state_store = FeedStateStore()
+
 def extract_image_from_entry(entry, feed_url):
     """استخراج رابط الصورة من مدخل RSS."""
     # محاولة استخراج الصورة من حقول مختلفة
@@ -48,31 +99,60 @@ def extract_image_from_entry(entry, feed_url):
     # لم يتم العثور على صورة
     return ''
 
-def parse_rss_feed(url):
-    """Parses an RSS feed and returns a list of articles."""
+def _parse_feed_content(content, url):
+    """Parses raw feed bytes into a list of article dicts."""
+    feed = feedparser.parse(content, response_headers={'content-location': url})
+    articles = []
+    for entry in feed.entries:
+        # Get publication date
+        published_time = getattr(entry, 'published_parsed', None) or getattr(entry, 'updated_parsed', None)
+        if published_time:
+            published_date = datetime.fromtimestamp(mktime(published_time))
+        else:
+            published_date = datetime.now() # Fallback to current time
+
+        # استخراج الصورة من المقال
+        image_url = extract_image_from_entry(entry, url)
+
+        articles.append({
+            'title': getattr(entry, 'title', 'No Title'),
+            'link': getattr(entry, 'link', ''),
+            'summary': getattr(entry, 'summary', ''),
+            'published_date': published_date,
+            'published_date_estimated': not published_time,
+            'source_name': feed.feed.get('title', 'Unknown Source'),
+            'image_url': image_url
+        })
+    return articles
+
+async def parse_rss_feed(url):
+    """
+    Fetches and parses an RSS feed and returns a list of articles.
+    Returns an empty list when the feed has not changed since the last poll.
+    """
     try:
-        feed = feedparser.parse(url)
-        articles = []
-        for entry in feed.entries:
-            # Get publication date
-            published_time = getattr(entry, 'published_parsed', None) or getattr(entry, 'updated_parsed', None)
-            if published_time:
-                published_date = datetime.fromtimestamp(mktime(published_time))
-            else:
-                published_date = datetime.now() # Fallback to current time
-
-            # استخراج الصورة من المقال
-            image_url = extract_image_from_entry(entry, url)
-
-            articles.append({
-                'title': getattr(entry, 'title', 'No Title'),
-                'link': getattr(entry, 'link', ''),
-                'summary': getattr(entry, 'summary', ''),
-                'published_date': published_date,
-                'source_name': feed.feed.get('title', 'Unknown Source'),
-                'image_url': image_url
-            })
+        headers = await feed_state_store.get_request_headers(url)
+        response = await http_client.fetch(url, headers=headers)
+        if response.status == 304:
+            logger.debug(f"Feed not modified (304): {url}")
+            return []
+        response.raise_for_status()
+
+        # تجاهل المحتوى المطابق لآخر نسخة تم تحليلها (للخوادم التي لا تدعم 304)
+        content_hash = hashlib.sha1(response.body).hexdigest()
+        if feed_state_store.is_unchanged(url, content_hash):
+            logger.debug(f"Feed body unchanged: {url}")
+            return []
+
+        # التحليل في خيط منفصل حتى لا يتوقف event loop
+        articles = await cpu_pool.run(_parse_feed_content, response.body, url)
+        feed_state_store.stage(
+            url,
+            response.headers.get('ETag'),
+            response.headers.get('Last-Modified'),
+            content_hash
+        )
         return articles
     except Exception as e:
         logger.error(f"Error parsing RSS feed {url}: {e}")
-        return []
\ No newline at end of file
+        return []
@@ -0,0 +1,65 @@
+# seen_links.py
+
+import logging
+import threading
+from collections import OrderedDict
+from config import SEEN_LINKS_CACHE_SIZE
+from database import get_existing_links, get_recent_links, session_scope
+
+logger = logging.getLogger(__name__)
+
+class SeenLinks:
+    """فهرس في الذاكرة للروابط المحفوظة مسبقاً لتفادي الاستعلام عن كل مقال"""
+    def __init__(self, max_size: int = SEEN_LINKS_CACHE_SIZE):
+        self.max_size = max_size
+        self._links = OrderedDict()
+        self._warmed = False
+        # filter_new يعمل في خيوط asyncio.to_thread لعدة مصادر في نفس الوقت
+        self._lock = threading.RLock()
+
+    def warm(self):
+        """تهيئة الفهرس من جدول المقالات عند بدء التشغيل"""
+        with self._lock:
+            if self._warmed:
+                return
+            links = get_recent_links(self.max_size)
+            # الإضافة من الأقدم إلى الأحدث حتى تبقى الروابط الأحدث عند الإزالة
+            self.add(reversed(links))
+            self._warmed = True
+        logger.info(f"Seen links index warmed with {len(self._links)} links")
+
+    def add(self, links):
+        """إضافة روابط معروفة مع إزالة الأقدم عند تجاوز الحد الأقصى"""
+        with self._lock:
+            for link in links:
+                if not link:
+                    continue
+                self._links[link] = None
+                self._links.move_to_end(link)
+            while len(self._links) > self.max_size:
+                self._links.popitem(last=False)
+
+    def __contains__(self, link):
+        return link in self._links
+
+    def __len__(self):
+        return len(self._links)
+
+    def filter_new(self, links) -> set:
+        """
+        إرجاع الروابط غير الموجودة في قاعدة البيانات باستعلام واحد للروابط المجهولة فقط.
+        دالة متزامنة تُستدعى عبر asyncio.to_thread، ولكل استدعاء جلسته الخاصة
+        """
+        self.warm()
+        unknown = {link for link in links if link and link not in self._links}
+        if not unknown:
+            return set()
+
+        with session_scope() as session:
+            existing = get_existing_links(session, unknown)
+        if existing:
+            self.add(existing)
+        return unknown - existing
+
+# إنشاء مثيل عام لفهرس الروابط المعروفة
+seen_links = SeenLinks()
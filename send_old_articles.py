@@ -11,7 +11,7 @@ from database import get_db_session, Article
 from bot import send_article_to_telegram, get_channel_id
 from telegram import Bot
 from config import TELEGRAM_BOT_TOKEN
-from sqlalchemy import func
+from sqlalchemy import func, false
 
 # إعداد التسجيل
 logging.basicConfig(
@@ -31,7 +31,7 @@ async def send_old_articles():
         
         # مقالات غير مرسلة مع مشاعر إيجابية
         articles = session.query(Article).filter(
-            Article.sent_to_telegram == False,
+            Article.sent_to_telegram == false(),
             Article.published_date >= seven_days_ago,
             Article.sentiment_score > 0.2  # مشاعر إيجابية أو محايدة
         ).order_by(
@@ -58,11 +58,6 @@ async def send_old_articles():
                 
                 logger.info(f"✅ تم إرسال المقال بنجاح: {article.title}")
                 
-                # انتظار 30 ثانية بين كل مقال
-                if i < len(articles):
-                    logger.info("⏳ انتظار 30 ثانية قبل إرسال المقال التالي...")
-                    await asyncio.sleep(30)
-                
             except Exception as e:
                 logger.error(f"❌ فشل في إرسال المقال {article.title}: {e}")
                 session.rollback()
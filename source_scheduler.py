@@ -0,0 +1,115 @@
+# source_scheduler.py
+
+import time
+import logging
+import datetime
+
+logger = logging.getLogger(__name__)
+
+# حدود فترة الجلب (بالثواني) حسب أولوية المصدر: (الحد الأدنى، الحد الأقصى)
+PRIORITY_BOUNDS = {
+    1: (30, 300),     # عاجل ورسمي
+    2: (60, 600),     # محلي مهم
+    3: (90, 900),     # رياضي محلي
+    4: (120, 1200),   # عالمي مهم
+    5: (300, 1800),   # اقتصادي عالمي
+    6: (300, 1800),   # رياضي عالمي
+    7: (600, 3600),   # تقني ومتخصص
+}
+DEFAULT_BOUNDS = (300, 1800)
+
+BACKOFF_FACTOR = 1.5  # مضاعف التباطؤ عند عدم وجود أخبار جديدة
+EWMA_ALPHA = 0.3  # وزن الملاحظة الجديدة في متوسط الفاصل بين الأخبار
+
+class SourceSchedule:
+    """حالة الجدولة لمصدر واحد"""
+    def __init__(self, name, priority):
+        self.name = name
+        self.priority = priority
+        self.min_interval, self.max_interval = PRIORITY_BOUNDS.get(priority, DEFAULT_BOUNDS)
+        self.interval = self.min_interval
+        self.next_poll = 0.0  # يُجلب فوراً عند أول دورة
+        self.last_poll = None
+        self.last_entry_time = None  # تاريخ نشر أحدث خبر تمت ملاحظته
+        self.mean_gap = None  # متوسط الفاصل بين الأخبار (بالثواني)
+
+    def _clamp(self, value):
+        return max(self.min_interval, min(self.max_interval, value))
+
+    def record(self, entry_times, estimated_count=0):
+        """
+        تحديث معدل النشر والفترة التالية بناءً على الأخبار الجديدة.
+        entry_times تواريخ النشر الحقيقية فقط؛ estimated_count عدد الأخبار الجديدة بتاريخ تقديري
+        (وقت الجلب)، وهي تدل على نشاط المصدر دون أن تُستخدم في حساب الفواصل
+        """
+        now = time.time()
+        self.last_poll = now
+
+        if entry_times:
+            # حساب الفواصل بين الأخبار الجديدة (مع آخر خبر معروف)
+            times = sorted(t.timestamp() if isinstance(t, datetime.datetime) else t for t in entry_times)
+            if self.last_entry_time is not None and self.last_entry_time < times[0]:
+                times.insert(0, self.last_entry_time)
+            for previous, current in zip(times, times[1:]):
+                gap = max(current - previous, 1.0)
+                if self.mean_gap is None:
+                    self.mean_gap = gap
+                else:
+                    self.mean_gap = EWMA_ALPHA * gap + (1 - EWMA_ALPHA) * self.mean_gap
+            self.last_entry_time = max(times[-1], self.last_entry_time or 0)
+
+            # الجلب مرتين خلال متوسط الفاصل المتوقع بين خبرين
+            if self.mean_gap is not None:
+                self.interval = self._clamp(self.mean_gap / 2)
+            else:
+                self.interval = self.min_interval
+        elif estimated_count:
+            # أخبار جديدة بتوقيت غير معروف: لا إبطاء، ولا تغيير في متوسط الفاصل
+            pass
+        else:
+            # لا أخبار جديدة: إبطاء تدريجي حتى الحد الأقصى
+            self.interval = self._clamp(self.interval * BACKOFF_FACTOR)
+
+        self.next_poll = now + self.interval
+        logger.debug(f"الجلب التالي للمصدر {self.name} بعد {self.interval:.0f} ثانية")
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'priority': self.priority,
+            'interval_seconds': round(self.interval),
+            'next_poll': datetime.datetime.utcfromtimestamp(self.next_poll).isoformat() if self.next_poll else None,
+            'last_poll': datetime.datetime.utcfromtimestamp(self.last_poll).isoformat() if self.last_poll else None,
+            'mean_gap_seconds': round(self.mean_gap) if self.mean_gap is not None else None,
+        }
+
+class SourceScheduler:
+    """جدولة تكيفية لكل مصدر حسب معدل النشر الملاحظ"""
+    def __init__(self):
+        self.schedules = {}
+
+    def _get_schedule(self, source):
+        schedule = self.schedules.get(source['name'])
+        if schedule is None:
+            schedule = SourceSchedule(source['name'], source.get('priority'))
+            self.schedules[source['name']] = schedule
+        return schedule
+
+    def get_due_sources(self, sources):
+        """إرجاع المصادر التي حان موعد جلبها"""
+        now = time.time()
+        return [source for source in sources if self._get_schedule(source).next_poll <= now]
+
+    def record_poll(self, source, entry_times, estimated_count=0):
+        """تسجيل نتيجة جلب مصدر وحساب موعده التالي"""
+        self._get_schedule(source).record(entry_times, estimated_count)
+
+    def get_status(self):
+        """إرجاع الفترة الحالية وموعد الجلب التالي لكل مصدر"""
+        return sorted(
+            (schedule.to_dict() for schedule in self.schedules.values()),
+            key=lambda item: item['next_poll'] or ''
+        )
+
+# إنشاء مثيل عام لجدولة المصادر
+source_scheduler = SourceScheduler()
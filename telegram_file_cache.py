@@ -0,0 +1,81 @@
+# telegram_file_cache.py
+
+import os
+import asyncio
+import hashlib
+import logging
+from database import get_telegram_file_id, save_telegram_file_id, delete_telegram_file_id
+from db_writer import db_writer
+
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+def _hash_file(path):
+    """حساب بصمة sha256 لمحتوى الملف"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class TelegramFileCache:
+    """
+    تخزين file_id الذي يرجعه التليجرام بعد أول رفع لصورة، مفهرساً ببصمة محتوى الملف،
+    فتُرسل نفس الصورة بعد ذلك (في مقالات أخرى أو عند إعادة الإرسال) دون رفعها من جديد
+    """
+    def __init__(self):
+        self._file_ids = {}
+        self._hashes = {}  # المسار -> (وقت التعديل، الحجم، البصمة)
+        self.hits = 0
+        self.uploads = 0
+
+    async def content_hash(self, path):
+        """بصمة محتوى ملف محلي (تُحسب مرة واحدة لكل نسخة من الملف)، أو None إذا لم يكن ملفاً محلياً"""
+        if not path or not isinstance(path, str):
+            return None
+        try:
+            stat = await asyncio.to_thread(os.stat, path)
+        except OSError:
+            self._hashes.pop(path, None)
+            return None
+
+        cached = self._hashes.get(path)
+        if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+            return cached[2]
+
+        content_hash = await asyncio.to_thread(_hash_file, path)
+        self._hashes[path] = (stat.st_mtime_ns, stat.st_size, content_hash)
+        return content_hash
+
+    async def get(self, content_hash):
+        """إرجاع file_id المحفوظ من الذاكرة ثم قاعدة البيانات، أو None"""
+        file_id = self._file_ids.get(content_hash)
+        if file_id is None:
+            file_id = await asyncio.to_thread(get_telegram_file_id, content_hash)
+            if file_id:
+                self._file_ids[content_hash] = file_id
+        if file_id:
+            self.hits += 1
+        return file_id
+
+    async def store(self, content_hash, file_id, file_unique_id=None):
+        """حفظ file_id بعد أول رفع ناجح"""
+        self._file_ids[content_hash] = file_id
+        self.uploads += 1
+        await db_writer.submit(save_telegram_file_id, content_hash, file_id, file_unique_id)
+
+    async def forget(self, content_hash):
+        """حذف file_id رفضه التليجرام (ليُرفع الملف من جديد)"""
+        self._file_ids.pop(content_hash, None)
+        await db_writer.submit(delete_telegram_file_id, content_hash)
+
+    def get_stats(self) -> dict:
+        return {
+            'file_id_hits': self.hits,
+            'uploads': self.uploads,
+            'known_files': len(self._file_ids),
+        }
+
+# إنشاء مثيل عام لتخزين معرفات ملفات التليجرام
+telegram_file_cache = TelegramFileCache()
@@ -1,87 +1,179 @@
 # web_scraper.py
 
-import requests
 import logging
-from bs4 import BeautifulSoup
-from datetime import datetime
+from datetime import datetime, timezone
 import re
 from urllib.parse import urljoin
+from bs4.element import NavigableString, PreformattedString
+from http_client import http_client
+from cpu_pool import cpu_pool
+from error_handler import NetworkError, KnownBadURLError
+from media_handler import find_video_in_soup
+from html_parser import make_soup, compile_selectors, get_compiled_config
+from page_sniffer import PageSniffer
+from config import ARTICLE_MAX_BYTES, ARTICLE_FETCH_DEADLINE
 
 logger = logging.getLogger(__name__)
 
-def scrape_website(source):
+def _parse_website_listing(content, source):
+    """
+    Parses a news listing page into a list of article dicts.
+    """
+    articles = []
+    soup = make_soup(content)
+
+    if source['name'] == 'kooora.com':
+        articles = _scrape_kooora(soup, source)
+    else:
+        # Generic scraping logic for other sites
+        for element in soup.find_all('div', class_='article-item'): # Example class, adjust as needed
+            title_element = element.find('h2', class_='article-title')
+            link_element = element.find('a', class_='article-link')
+            summary_element = element.find('p', class_='article-summary')
+            image_element = element.find('img', class_='article-image')
+
+            title = title_element.get_text().strip() if title_element else ''
+            link = link_element.get('href') if link_element else ''
+            summary = summary_element.get_text().strip() if summary_element else ''
+            image_url = image_element.get('src') if image_element else ''
+
+            if link and not link.startswith(('http://', 'https://')):
+                link = urljoin(source['url'], link)
+            if image_url and not image_url.startswith(('http://', 'https://')):
+                image_url = urljoin(source['url'], image_url)
+
+            if title and link:
+                articles.append({
+                    'title': title,
+                    'link': link,
+                    'summary': summary,
+                    'published_date': datetime.now(), # Replaced by the article page's time when available
+                    'published_date_estimated': True,
+                    'source_name': source['name'],
+                    'image_url': image_url
+                })
+    return articles
+
+async def scrape_website(source):
     """
     استخراج الأخبار من المواقع التي لا تدعم RSS
     """
     articles = []
     try:
         logger.info(f"Scraping website: {source['name']} - {source['url']}")
-        response = requests.get(source['url'], timeout=30)
+        response = await http_client.fetch(source['url'])
         response.raise_for_status()  # Raise an HTTPError for bad responses (4xx or 5xx)
-        soup = BeautifulSoup(response.content, 'html.parser')
-
-        if source['name'] == 'kooora.com':
-            articles = _scrape_kooora(soup, source)
-        else:
-            # Generic scraping logic for other sites
-            for element in soup.find_all('div', class_='article-item'): # Example class, adjust as needed
-                title_element = element.find('h2', class_='article-title')
-                link_element = element.find('a', class_='article-link')
-                summary_element = element.find('p', class_='article-summary')
-                image_element = element.find('img', class_='article-image')
-
-                title = title_element.get_text().strip() if title_element else ''
-                link = link_element.get('href') if link_element else ''
-                summary = summary_element.get_text().strip() if summary_element else ''
-                image_url = image_element.get('src') if image_element else ''
-
-                if link and not link.startswith(('http://', 'https://')):
-                    link = urljoin(source['url'], link)
-                if image_url and not image_url.startswith(('http://', 'https://')):
-                    image_url = urljoin(source['url'], image_url)
-
-                if title and link:
-                    articles.append({
-                        'title': title,
-                        'link': link,
-                        'summary': summary,
-                        'published_date': datetime.now(), # Or extract from page if available
-                        'source_name': source['name'],
-                        'image_url': image_url
-                    })
-    except requests.exceptions.RequestException as e:
+        articles = await cpu_pool.run(_parse_website_listing, response.body, source)
+    except NetworkError as e:
         logger.error(f"Error scraping {source['name']}: {e}")
     except Exception as e:
         logger.error(f"An unexpected error occurred while scraping {source['name']}: {e}")
     return articles
 
-def _scrape_content_with_config(soup, scraping_config):
+# Readability-style fallback scoring
+CONTENT_NODE_BUDGET = 50000  # Hard cap on nodes visited per page
+CONTENT_MIN_PARAGRAPHS = 3  # A container needs at least this many paragraphs to be picked
+CONTENT_CONTAINER_TAGS = {'div', 'article', 'section', 'main', 'td'}
+CONTENT_SKIP_TAGS = {'script', 'style', 'noscript', 'nav', 'aside', 'header', 'footer', 'form'}
+CONTENT_TOP_CANDIDATES = 5  # Only the best few candidates get a link-density check
+
+def _score_paragraph(text_length, commas):
     """
-    Generic function to scrape article content based on a configuration.
+    Scores a paragraph by its text: longer text and more commas suggest article prose.
+    """
+    return 1 + commas + min(text_length / 100, 3)
+
+def _link_density(element):
+    """
+    Ratio of link text to all text in an element (menus and related-links blocks score high).
+    """
+    text_length = len(element.get_text(strip=True))
+    if not text_length:
+        return 1.0
+    link_length = sum(len(link.get_text(strip=True)) for link in element.find_all('a'))
+    return link_length / text_length
+
+def _find_main_content(soup, node_budget=CONTENT_NODE_BUDGET):
+    """
+    Finds the main content container in a single pass over the tree.
+    Text is accumulated into its enclosing <p>; each paragraph then adds its score to its
+    parent container and half of it to the grandparent, and the best few candidates are
+    penalised by link density. Stops after node_budget nodes so pathological pages
+    cannot stall the pipeline.
+    """
+    paragraphs = {}  # id(p) -> [p, text length, commas]
+    visited = 0
+
+    # Iterative depth-first walk carrying the enclosing paragraph; skipped subtrees are never entered
+    stack = [(soup, None)]
+    while stack:
+        node, paragraph = stack.pop()
+        visited += 1
+        if visited > node_budget:
+            logger.warning(f"Content scoring stopped after {node_budget} nodes")
+            break
+
+        if isinstance(node, NavigableString):
+            if paragraph is not None and not isinstance(node, PreformattedString):
+                text = node.strip()
+                entry = paragraphs[paragraph]
+                entry[1] += len(text)
+                entry[2] += text.count(',') + text.count('،')
+            continue
+
+        if node.name in CONTENT_SKIP_TAGS:
+            continue
+        if node.name == 'p':
+            paragraph = id(node)
+            paragraphs[paragraph] = [node, 0, 0]
+        for child in reversed(node.contents):
+            stack.append((child, paragraph))
+
+    scores = {}
+    paragraph_counts = {}
+    candidates = {}
+    for node, text_length, commas in paragraphs.values():
+        if text_length < 25:
+            continue
+        score = _score_paragraph(text_length, commas)
+        parent = node.parent
+        grandparent = parent.parent if parent is not None else None
+        for container, weight in ((parent, 1.0), (grandparent, 0.5)):
+            if container is None or container.name not in CONTENT_CONTAINER_TAGS:
+                continue
+            key = id(container)
+            candidates[key] = container
+            scores[key] = scores.get(key, 0) + score * weight
+            paragraph_counts[key] = paragraph_counts.get(key, 0) + 1
+
+    eligible = [key for key in scores if paragraph_counts[key] >= CONTENT_MIN_PARAGRAPHS]
+    if not eligible:
+        return None
+
+    top = sorted(eligible, key=scores.get, reverse=True)[:CONTENT_TOP_CANDIDATES]
+    best = max(top, key=lambda key: scores[key] * (1 - _link_density(candidates[key])))
+    return candidates[best]
+
+def _scrape_content_with_config(soup, compiled_config):
+    """
+    Generic function to scrape article content based on a source's precompiled configuration.
     """
     try:
         # Remove unwanted elements first
-        unwanted_selectors = scraping_config.get('unwanted_selectors', [])
-        for selector in unwanted_selectors:
-            for element in soup.select(selector):
+        for selector in compiled_config.unwanted_selectors:
+            for element in selector.select(soup):
                 element.decompose()
 
         # Find the main article content
-        content_selectors = scraping_config.get('content_selectors', [])
         article_content = None
-        for selector in content_selectors:
-            article_content = soup.select_one(selector)
+        for selector in compiled_config.content_selectors:
+            article_content = selector.select_one(soup)
             if article_content:
                 break
 
-        # Fallback to finding paragraphs if no specific content container is found
+        # Fallback to scoring blocks by paragraph and text density if no specific content container is found
         if not article_content:
-            main_divs = soup.find_all('div')
-            for div in main_divs:
-                paragraphs = div.find_all('p')
-                if len(paragraphs) >= 3:  # Heuristic: a div with at least 3 paragraphs is likely the content
-                    article_content = div
-                    break
+            article_content = _find_main_content(soup)
 
         if article_content:
             # Remove unwanted elements from the content
@@ -103,23 +195,109 @@ def _scrape_content_with_config(soup, scraping_config):
         logger.error(f"Error scraping content with config: {e}")
         return None
 
-def scrape_article_content(url, source):
+IMAGE_META_SELECTORS = compile_selectors((
+    'meta[property="og:image"]',
+    'meta[name="og:image"]',
+    'meta[name="twitter:image"]',
+    'meta[property="twitter:image"]',
+))
+
+PUBLISHED_META_SELECTORS = compile_selectors((
+    'meta[property="article:published_time"]',
+    'meta[name="article:published_time"]',
+    'meta[itemprop="datePublished"]',
+    'meta[name="pubdate"]',
+    'meta[name="date"]',
+))
+
+def _extract_page_image(soup, url):
     """
-    Extracts article content from a URL using a generic scraping function.
+    Returns the page's Open Graph / Twitter card image, if any.
+    """
+    for selector in IMAGE_META_SELECTORS:
+        meta = selector.select_one(soup)
+        if meta and meta.get('content'):
+            return urljoin(url, meta['content'].strip())
+    return ''
+
+def _parse_published_date(value):
     """
+    Parses an ISO 8601 timestamp into a naive UTC datetime (as stored in the database).
+    """
+    if not value:
+        return None
     try:
-        logger.info(f"Scraping article content from: {url}")
-        response = requests.get(url, timeout=30)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.content, 'html.parser')
+        published = datetime.fromisoformat(value.strip().replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if published.tzinfo is not None:
+        published = published.astimezone(timezone.utc).replace(tzinfo=None)
+    return published
+
+def _extract_published_date(soup):
+    """
+    Returns the article's published time from meta tags or the first <time datetime>.
+    """
+    for selector in PUBLISHED_META_SELECTORS:
+        meta = selector.select_one(soup)
+        if meta:
+            published = _parse_published_date(meta.get('content'))
+            if published:
+                return published
+    time_tag = soup.find('time', datetime=True)
+    if time_tag:
+        return _parse_published_date(time_tag['datetime'])
+    return None
+
+def _parse_article_page(content, source, url, backend=None):
+    """
+    Parses an article page once and extracts everything the bot needs from it:
+    body text, og:image, video/iframe embeds and published time.
+    """
+    soup = make_soup(content, backend)
+
+    # Media and metadata are read first: content scraping removes elements from the tree
+    image_url = _extract_page_image(soup, url)
+    video_url = find_video_in_soup(soup, url)
+    published_date = _extract_published_date(soup)
 
-        # Use the generic scraper with the source's specific configuration
-        scraping_config = source.get('scraping_config', {})
-        return _scrape_content_with_config(soup, scraping_config)
+    # Use the generic scraper with the source's precompiled configuration
+    return {
+        'content': _scrape_content_with_config(soup, get_compiled_config(source)),
+        'image_url': image_url,
+        'video_url': video_url,
+        'published_date': published_date,
+    }
+
+async def fetch_article_page(url, source):
+    """
+    Downloads an article page once and returns its parsed content and media, or None.
+    """
+    try:
+        logger.info(f"Fetching article page: {url}")
+        # Stream the page with a byte cap and a total deadline. When the first content selector is simple,
+        # a byte scan stops the download once that container closes; otherwise read up to the cap.
+        sniffer = PageSniffer.for_content(source.get('scraping_config', {}).get('content_selectors', []))
+        response = await http_client.fetch(
+            url, timeout=ARTICLE_FETCH_DEADLINE, max_bytes=ARTICLE_MAX_BYTES, sniffer=sniffer,
+            remember_failures=True
+        )
+        response.raise_for_status()
+        return await cpu_pool.run(_parse_article_page, response.body, source, str(response.url))
 
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Error fetching article content from {url}: {e}")
+    except KnownBadURLError as e:
+        logger.info(str(e))
+        return None
+    except NetworkError as e:
+        logger.error(f"Error fetching article page from {url}: {e}")
         return None
     except Exception as e:
-        logger.error(f"An unexpected error occurred while scraping article content from {url}: {e}")
-        return None
\ No newline at end of file
+        logger.error(f"An unexpected error occurred while parsing article page {url}: {e}")
+        return None
+
+async def scrape_article_content(url, source):
+    """
+    Extracts article content from a URL using a generic scraping function.
+    """
+    page = await fetch_article_page(url, source)
+    return page['content'] if page else None